@@ -0,0 +1,47 @@
+from django.contrib import admin
+
+from .models import SlowQuery
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = (
+        'short_sql',
+        'view',
+        'count',
+        'average_ms',
+        'max_ms',
+        'last_seen',
+    )
+    search_fields = ('sql', 'view')
+    list_filter = ('database', )
+    readonly_fields = (
+        'fingerprint',
+        'sql',
+        'view',
+        'database',
+        'count',
+        'total_duration',
+        'max_duration',
+        'plan',
+        'first_seen',
+        'last_seen',
+    )
+
+    def short_sql(self, obj):
+        return str(obj)
+    short_sql.short_description = 'SQL'
+
+    def average_ms(self, obj):
+        return round(obj.average_duration * 1000, 1)
+    average_ms.short_description = 'Среднее, мс'
+
+    def max_ms(self, obj):
+        return round(obj.max_duration * 1000, 1)
+    max_ms.short_description = 'Наибольшее, мс'
+    max_ms.admin_order_field = 'max_duration'
+
+    def has_add_permission(self, request):
+        return False
+
+
+admin.site.register(SlowQuery, SlowQueryAdmin)
@@ -3,3 +3,15 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        # Сброс кэшей по изменениям моделей, обёртки запросов к БД
+        # и проверка соединений подключаются при импорте модулей.
+        from . import database, signals, slow_queries  # noqa: F401
+        from .replicas import check_pin_cache
+        from .throttling import get_bucket_storage
+
+        # Неверное хранилище лимитов или кэш закрепления за основной
+        # БД - ошибка при запуске, а не при первом запросе.
+        get_bucket_storage()
+        check_pin_cache()
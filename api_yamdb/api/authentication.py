@@ -0,0 +1,277 @@
+# api/authentication.py
+"""JWT-аутентификация без запроса пользователя на каждый запрос.
+
+Разрешениям нужны только роль и флаги пользователя. API_PRINCIPAL:
+
+- MODE 'claims': роль и флаги берутся из подписанных claims токена;
+- MODE 'cache': пользователь кэшируется в памяти процесса на TIMEOUT;
+- MODE 'database': как JWTAuthentication, запрос к БД каждый раз.
+
+Изменение пользователя сдвигает его версию в общем кэше версий
+(api/signals.py). Кэшированная запись и claims выданного токена помнят
+версию; при несовпадении пользователь заново читается из БД, поэтому
+новая роль действует сразу, а не после истечения токена или TTL.
+Если кэш версий не общий для процессов (LocMemCache), сдвиг версии
+в одном воркере не увидят другие, и они продолжили бы доверять старой
+роли; тогда режимы claims и cache не используются - пользователь
+читается из БД.
+
+Набор классов аутентификации задаётся профилями
+API_AUTHENTICATION_PROFILES (см. authentication_profile). Там, где
+оставлена Basic-аутентификация, CachedBasicAuthentication не считает
+PBKDF2 для уже проверенных недавно логина и пароля.
+"""
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import BasicAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from reviews.models import User
+from .cache import get_versions, get_versions_alias, is_shared_cache
+from .metrics import Counter
+
+# Поля, которые читают разрешения; остальные поля отложены.
+# Model.from_db ждёт значения в порядке полей модели.
+PRINCIPAL_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in ('id', 'username', 'role', 'is_staff',
+                         'is_superuser', 'is_active'))
+CLAIM_FIELDS = tuple(field for field in PRINCIPAL_FIELDS if field != 'id')
+VERSION_CLAIM = 'principal_version'
+
+principal_lookups = Counter(
+    'api_principal_lookups_total',
+    'Источник пользователя аутентифицированного запроса.',
+    ('source', ),
+)
+
+
+basic_auth_checks = Counter(
+    'api_basic_auth_checks_total',
+    'Проверки Basic-аутентификации: по кэшу или с хэшированием пароля.',
+    ('result', ),
+)
+
+
+def authentication_profile(name):
+    """Классы аутентификации группы эндпоинтов из настроек."""
+    return [import_string(path)
+            for path in settings.API_AUTHENTICATION_PROFILES[name]]
+
+
+def principal_resource(user_id):
+    return f'user:{user_id}'
+
+
+def principal_version(user_id):
+    return get_versions([principal_resource(user_id)])[0]
+
+
+def get_principal_mode():
+    """MODE из API_PRINCIPAL; без общего кэша версий - database."""
+    mode = settings.API_PRINCIPAL.get('MODE', 'cache')
+    if mode != 'database' and not is_shared_cache(get_versions_alias()):
+        return 'database'
+    return mode
+
+
+def build_principal(values):
+    """Пользователь из значений PRINCIPAL_FIELDS, без запроса к БД."""
+    return User.from_db(DEFAULT_DB_ALIAS, PRINCIPAL_FIELDS, values)
+
+
+def tokens_for_user(user):
+    """Пара токенов; в access записываются роль и флаги пользователя."""
+    refresh = RefreshToken.for_user(user)
+    access = refresh.access_token
+    for field in CLAIM_FIELDS:
+        access[field] = getattr(user, field)
+    access[VERSION_CLAIM] = principal_version(user.pk)
+    return refresh, access
+
+
+class PrincipalCache:
+    """LRU с TTL: id пользователя -> (срок, версия, значения полей)."""
+
+    def __init__(self, options):
+        self.timeout = options.get('TIMEOUT', 300)
+        self.max_entries = options.get('MAX_ENTRIES', 10000)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                return None
+            expires_at, cached_version, values = entry
+            if expires_at < time.monotonic() or cached_version != version:
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return values
+
+    def set(self, user_id, version, values):
+        with self._lock:
+            self._data[user_id] = (time.monotonic() + self.timeout,
+                                   version, values)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+_principal_cache = None
+
+
+def get_principal_cache():
+    global _principal_cache
+    if _principal_cache is None:
+        _principal_cache = PrincipalCache(settings.API_PRINCIPAL)
+    return _principal_cache
+
+
+@receiver(setting_changed)
+def reset_principal_cache(setting, **kwargs):
+    global _principal_cache
+    if setting in ('API_PRINCIPAL', 'CACHES'):
+        _principal_cache = None
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, которая не читает пользователя из БД
+    на каждый запрос (см. API_PRINCIPAL)."""
+
+    def get_user(self, validated_token):
+        mode = get_principal_mode()
+        if mode == 'database':
+            principal_lookups.inc('database')
+            return super().get_user(validated_token)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+        version = principal_version(user_id)
+        if (mode == 'claims'
+                and validated_token.get(VERSION_CLAIM) == version):
+            claims = dict(validated_token.payload, id=user_id)
+            values = [claims.get(field) for field in PRINCIPAL_FIELDS]
+            principal_lookups.inc('claims')
+            return self.check_active(build_principal(values))
+
+        cache = get_principal_cache()
+        values = cache.get(user_id, version)
+        if values is not None:
+            principal_lookups.inc('cache')
+            return self.check_active(build_principal(values))
+        principal_lookups.inc('database')
+        values = User.objects.filter(pk=user_id).values_list(
+            *PRINCIPAL_FIELDS).first()
+        if values is None:
+            raise AuthenticationFailed(_('User not found'),
+                                       code='user_not_found')
+        cache.set(user_id, version, values)
+        return self.check_active(build_principal(values))
+
+    def check_active(self, user):
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'),
+                                       code='user_inactive')
+        return user
+
+
+class CredentialCache:
+    """LRU с TTL: HMAC логина и пароля -> (срок, id, хэш пароля).
+
+    Сам пароль не хранится, только его HMAC на SECRET_KEY.
+    """
+
+    def __init__(self, options):
+        self.timeout = options.get('TIMEOUT', 60)
+        self.max_entries = options.get('MAX_ENTRIES', 1024)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(userid, password):
+        message = f'{userid}\0{password}'.encode('utf-8')
+        return hmac.new(settings.SECRET_KEY.encode('utf-8'), message,
+                        hashlib.sha256).digest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1:]
+
+    def set(self, key, user_id, password_hash):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout,
+                               user_id, password_hash)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+_credential_cache = None
+
+
+def get_credential_cache():
+    global _credential_cache
+    if _credential_cache is None:
+        _credential_cache = CredentialCache(settings.API_BASIC_AUTH_CACHE)
+    return _credential_cache
+
+
+@receiver(setting_changed)
+def reset_credential_cache(setting, **kwargs):
+    global _credential_cache
+    if setting == 'API_BASIC_AUTH_CACHE':
+        _credential_cache = None
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """Basic-аутентификация, которая не хэширует пароль повторно.
+
+    Недавно проверенные логин и пароль узнаются по HMAC. Пользователь
+    всё равно читается из БД, и кэш действует, только пока хэш пароля
+    в БД тот же, что при проверке: смена пароля сразу его отменяет.
+    """
+
+    def authenticate_credentials(self, userid, password, request=None):
+        cache = get_credential_cache()
+        key = cache.make_key(userid, password)
+        cached = cache.get(key)
+        if cached is not None:
+            user_id, password_hash = cached
+            user = User.objects.filter(pk=user_id).first()
+            if (user is not None and user.is_active
+                    and hmac.compare_digest(user.password, password_hash)):
+                basic_auth_checks.inc('cache')
+                return user, None
+            cache.discard(key)
+        basic_auth_checks.inc('hash')
+        user, auth = super().authenticate_credentials(
+            userid, password, request)
+        cache.set(key, user.pk, user.password)
+        return user, auth
@@ -0,0 +1,65 @@
+"""PostgreSQL с пулом соединений процесса (api/database.py).
+
+ENGINE = 'api.backends.postgresql_pool', параметры пула - в ключе POOL
+настроек базы. Django закрывает соединение в конце запроса при
+CONN_MAX_AGE = 0; здесь оно возвращается в пул, и следующий запрос
+любого потока процесса получает его без установки нового соединения.
+С CONN_MAX_AGE > 0 соединение осталось бы у потока, а пул был бы
+лишним, поэтому такая настройка - ошибка конфигурации.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from api.database import ConnectionPool, get_pool
+
+
+def ping(raw):
+    try:
+        with raw.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except base.Database.Error:
+        return False
+    return True
+
+
+def reset(raw):
+    """Откатывает незавершённую транзакцию; False - соединение сломано."""
+    if raw.closed:
+        return False
+    status = raw.info.transaction_status
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        try:
+            raw.rollback()
+        except base.Database.Error:
+            return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, settings_dict, *args, **kwargs):
+        if settings_dict.get('CONN_MAX_AGE') != 0:
+            raise ImproperlyConfigured(
+                'api.backends.postgresql_pool требует CONN_MAX_AGE = 0 '
+                '(DB_CONN_MAX_AGE=0): соединения возвращает в пул конец '
+                'запроса.')
+        super().__init__(settings_dict, *args, **kwargs)
+
+    def get_pool(self):
+        return get_pool(self.alias, lambda: ConnectionPool(
+            self.alias, ping, reset, self.settings_dict.get('POOL', {})))
+
+    def get_new_connection(self, conn_params):
+        return self.get_pool().checkout(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            # Соединение, закрытое внутри atomic, Django ещё считает
+            # своим: в пул оно не возвращается.
+            self.get_pool().checkin(self.connection,
+                                    discard=self.in_atomic_block)
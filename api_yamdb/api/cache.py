@@ -0,0 +1,274 @@
+# api/cache.py
+"""Кэш ответов API для анонимных GET-запросов.
+
+Ключ ответа содержит номера версий ресурсов, от которых он зависит
+(titles, genres, categories, reviews). Любая запись в эти модели
+увеличивает версию (см. api/signals.py), поэтому старые ключи просто
+перестают запрашиваться и вытесняются по LRU или TTL.
+
+Версии хранятся в кэше Django с алиасом VERSIONS_CACHE. Чтобы сброс
+был виден всем воркерам gunicorn, это должен быть общий кэш
+(memcached в docker-compose). Если он локальный для процесса
+(LocMemCache), запись в одном воркере не сбросила бы ответы в других,
+поэтому кэш ответов выключается (DummyResponseCache).
+
+Те же ответы помечаются заголовком Cache-Control для микрокэша nginx
+(infra/nginx/default.conf): public с s-maxage и stale-while-revalidate
+из API_EDGE_CACHE. Остальные ответы этих вьюсетов - private, no-cache.
+"""
+import hashlib
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import urlencode
+from django.utils.module_loading import import_string
+from rest_framework import permissions
+from rest_framework.response import Response
+
+from .metrics import Counter
+
+VERSION_KEY_PREFIX = 'api:version:'
+RESPONSE_KEY_PREFIX = 'api:response:'
+
+# Кэши, записи которых не видны другим процессам.
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+logger = logging.getLogger(__name__)
+
+cache_requests = Counter(
+    'api_response_cache_requests_total',
+    'Обращения к кэшу ответов API.',
+    ('view', 'result'),
+)
+
+
+class BaseResponseCache:
+    def __init__(self, options):
+        self.timeout = options.get('TIMEOUT', 60)
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+
+class DummyResponseCache(BaseResponseCache):
+    """Кэш выключен: ничего не хранит."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+
+class LRUResponseCache(BaseResponseCache):
+    """LRU в памяти процесса с ограничением размера и TTL.
+
+    Значения хранятся сериализованными, чтобы закэшированный ответ
+    нельзя было изменить по ссылке и чтобы он не держал сериализатор.
+    """
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.max_entries = options.get('MAX_ENTRIES', 1024)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        return pickle.loads(payload)
+
+    def set(self, key, value):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SharedResponseCache(BaseResponseCache):
+    """Ответы в кэше Django (memcached, LocMemCache и т.п.)."""
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.cache = caches[options.get('CACHE_ALIAS', 'default')]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+
+def is_shared_cache(alias):
+    """Видны ли записи кэша alias всем воркерам gunicorn."""
+    return not isinstance(caches[alias], PROCESS_LOCAL_CACHES)
+
+
+def get_versions_alias():
+    return settings.API_RESPONSE_CACHE.get('VERSIONS_CACHE', 'default')
+
+
+def get_versions_cache():
+    return caches[get_versions_alias()]
+
+
+def title_resource(title_id):
+    """Ресурс отзывов одного произведения (его рейтинг)."""
+    return f'title:{title_id}'
+
+
+def initial_version():
+    # Если счётчик вытеснят из кэша, новый начнётся с текущего времени
+    # в миллисекундах и не совпадёт с версиями ещё живых ответов.
+    return int(time.time() * 1000)
+
+
+def get_versions(resources):
+    """Текущие версии ресурсов; отсутствующие заводятся заново."""
+    cache = get_versions_cache()
+    keys = [VERSION_KEY_PREFIX + resource for resource in resources]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            cache.add(key, initial_version(), timeout=None)
+            version = cache.get(key)
+        versions.append(version)
+    return versions
+
+
+def bump_version(resource):
+    """Делает недействительными все ответы, зависящие от ресурса."""
+    cache = get_versions_cache()
+    key = VERSION_KEY_PREFIX + resource
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, initial_version(), timeout=None):
+            cache.incr(key)
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        config = settings.API_RESPONSE_CACHE
+        backend = import_string(config['BACKEND'])
+        if (backend is not DummyResponseCache
+                and not is_shared_cache(get_versions_alias())):
+            logger.warning(
+                'Кэш ответов API выключен: кэш версий %r не общий для '
+                'процессов', get_versions_alias())
+            backend = DummyResponseCache
+        _response_cache = backend(config.get('OPTIONS', {}))
+    return _response_cache
+
+
+@receiver(setting_changed)
+def reset_response_cache(setting, **kwargs):
+    global _response_cache
+    if setting in ('API_RESPONSE_CACHE', 'CACHES'):
+        _response_cache = None
+
+
+def make_response_key(request, view_name, resources):
+    versions = '.'.join(str(v) for v in get_versions(resources))
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    location = '{}{}?{}'.format(request.get_host(), request.path, query)
+    digest = hashlib.sha1(location.encode('utf-8')).hexdigest()
+    return f'{RESPONSE_KEY_PREFIX}{view_name}:{versions}:{digest}'
+
+
+class CachedResponseMixin:
+    """Кэширует list вьюсета для анонимных GET-запросов.
+
+    cache_resources перечисляет ресурсы, от которых зависит ответ.
+    Другие действия кэшируются явным вызовом cached_response.
+    """
+    cache_resources = ()
+    edge_cacheable = False
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def is_response_cacheable(self, request):
+        return (request.method in permissions.SAFE_METHODS
+                and request.method != 'OPTIONS'
+                and not request.user.is_authenticated)
+
+    def cached_response(self, handler, request, *args, resources=None,
+                        **kwargs):
+        if not self.is_response_cacheable(request):
+            return handler(request, *args, **kwargs)
+        self.edge_cacheable = True
+        if resources is None:
+            resources = self.cache_resources
+        view_name = f'{self.__class__.__name__}.{self.action}'
+        # Версии читаются до запроса к БД: если запись случится во время
+        # построения ответа, он ляжет под уже устаревший ключ.
+        key = make_response_key(request, view_name, resources)
+        cache = get_response_cache()
+        data = cache.get(key)
+        if data is not None:
+            cache_requests.inc(view_name, 'hit')
+            return Response(data)
+        cache_requests.inc(view_name, 'miss')
+        if isinstance(cache, DummyCache):
+            return handler(request, *args, **kwargs)
+        response = self.fill_cached_response(
+            handler, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data)
+        return response
+
+    def fill_cached_response(self, handler, request, *args, **kwargs):
+        """Строит ответ, который ляжет в кэш (ReplicaReadMixin читает
+        его из основной БД)."""
+        return handler(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        config = settings.API_EDGE_CACHE
+        if (self.edge_cacheable and response.status_code == 200
+                and config['S_MAXAGE']):
+            # max-age=0: браузер перепроверяет ответ, общий кэш
+            # (nginx) держит его s-maxage секунд.
+            patch_cache_control(
+                response, public=True, max_age=0,
+                s_maxage=config['S_MAXAGE'],
+                stale_while_revalidate=config['STALE_WHILE_REVALIDATE'])
+        elif response.status_code != 304:
+            # У 304 остаются заголовки ответа, который проверяет клиент.
+            patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization', ))
+        return response
@@ -0,0 +1,86 @@
+# api/conditional.py
+"""Условные GET-запросы (ETag / Last-Modified) по отметке изменения.
+
+ETag строится из Title.modified и адреса запроса, а не из тела ответа,
+поэтому ответ 304 отдаётся до выборки и сериализации данных.
+
+Last-Modified точен до секунды, отметка - до микросекунды. Пока секунда
+отметки не кончилась, в неё может попасть ещё одна запись, и клиент
+с If-Modified-Since получил бы 304 с устаревшими данными. Поэтому
+Last-Modified отдаётся и проверяется только для прошедшей секунды;
+до этого остаётся ETag.
+"""
+import hashlib
+import time
+
+from django.http import Http404, HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag, urlencode
+
+
+class NotModified(Exception):
+    """Прерывает обработку запроса готовым ответом 304/412."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 на If-None-Match/If-Modified-Since.
+
+    Вьюсет реализует get_last_modified(): дешёвый запрос отметки
+    изменения родительского произведения (или Http404).
+    """
+    conditional_actions = ('list', 'retrieve')
+    conditional_etag = None
+    conditional_last_modified = None
+
+    def get_last_modified(self):
+        raise NotImplementedError
+
+    def get_etag(self, request, last_modified):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        location = '{}:{}:{}{}?{}'.format(
+            self.action, request.accepted_media_type,
+            request.get_host(), request.path, query)
+        digest = hashlib.sha1(location.encode('utf-8')).hexdigest()[:16]
+        marker = int(last_modified.timestamp() * 1000000)
+        return quote_etag(f'{marker:x}-{digest}')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (request.method not in ('GET', 'HEAD')
+                or self.action not in self.conditional_actions):
+            return
+        last_modified = self.get_last_modified()
+        if last_modified is None:
+            raise Http404
+        self.conditional_etag = self.get_etag(request, last_modified)
+        second = int(last_modified.timestamp())
+        if time.time() >= second + 1:
+            self.conditional_last_modified = second
+        response = get_conditional_response(
+            request._request,
+            etag=self.conditional_etag,
+            last_modified=self.conditional_last_modified,
+        )
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        if self.conditional_etag is not None and (
+                response.status_code == 200
+                or isinstance(response, HttpResponseNotModified)):
+            response['ETag'] = self.conditional_etag
+            if self.conditional_last_modified is not None:
+                response['Last-Modified'] = http_date(
+                    self.conditional_last_modified)
+        return response
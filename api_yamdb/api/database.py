@@ -0,0 +1,246 @@
+# api/database.py
+"""Постоянные соединения с БД: проверка перед запросом и пул.
+
+При CONN_MAX_AGE > 0 Django держит соединение между запросами, но
+в Django 2.2 не проверяет его перед использованием: после перезапуска
+PostgreSQL или обрыва сети первый запрос воркера падал бы с ошибкой.
+check_connections (по сигналу request_started) пингует открытые
+соединения баз с CONN_HEALTH_CHECKS и закрывает мёртвые - следующий
+запрос откроет новое. Пингуются только соединения, простоявшие без
+запросов дольше CONN_HEALTH_CHECK_IDLE секунд (время последнего
+запроса отмечает track_connection_use): под нагрузкой соединение
+только что работало, и лишний SELECT 1 к каждому алиасу, включая
+реплики, которые запрос может и не использовать, ничего бы не дал.
+
+ConnectionPool - пул процесса для движка api.backends.postgresql_pool:
+не больше MAX_SIZE соединений на процесс, ожидание свободного не
+дольше TIMEOUT секунд. Время получения соединения и заполненность
+пула видны в /metrics.
+"""
+import collections
+import os
+import threading
+import time
+
+from django.core.signals import request_started
+from django.db import OperationalError, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import Counter, Gauge, Histogram
+
+health_checks = Counter(
+    'api_db_health_checks_total',
+    'Проверки постоянных соединений с БД перед запросом.',
+    ('alias', 'result'),
+)
+pool_checkouts = Counter(
+    'api_db_pool_checkouts_total',
+    'Получение соединения из пула: idle - свободное, new - новое, '
+    'timeout - пул занят дольше TIMEOUT.',
+    ('alias', 'result'),
+)
+pool_checkout_duration = Histogram(
+    'api_db_pool_checkout_seconds',
+    'Время получения соединения из пула, включая ожидание.',
+    ('alias', ),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+pool_connections = Gauge(
+    'api_db_pool_connections',
+    'Соединения пула: in_use - выданные, idle - свободные, max - предел.',
+    ('alias', 'state'),
+)
+
+
+def track_connection_use(execute, sql, params, many, context):
+    """execute_wrapper: отмечает время последнего запроса соединения."""
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        context['connection'].last_used_at = time.monotonic()
+
+
+@receiver(connection_created)
+def install_connection_tracking(connection, **kwargs):
+    # Список обёрток живёт в объекте соединения и переживает
+    # переподключения: ставим обёртку один раз.
+    if track_connection_use not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_connection_use)
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    """Закрывает простаивавшие постоянные соединения, которые
+    перестали отвечать.
+
+    Срабатывает после close_old_connections Django, который уже
+    закрыл соединения с истёкшим CONN_MAX_AGE.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        settings_dict = connection.settings_dict
+        if (connection.connection is None or connection.in_atomic_block
+                or not settings_dict.get('CONN_HEALTH_CHECKS')):
+            continue
+        idle = settings_dict.get('CONN_HEALTH_CHECK_IDLE', 5)
+        if now - getattr(connection, 'last_used_at', 0) < idle:
+            continue
+        usable = connection.is_usable()
+        connection.last_used_at = time.monotonic()
+        health_checks.inc(connection.alias, 'ok' if usable else 'failed')
+        if not usable:
+            connection.close()
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """Ограниченный пул соединений DB-API одного процесса.
+
+    ping - проверка соединения, пролежавшего в пуле дольше
+    HEALTH_CHECK_IDLE секунд, reset - возврат соединения в исходное
+    состояние; обе возвращают False, если соединение нужно закрыть.
+    """
+
+    def __init__(self, alias, ping, reset, options):
+        self.alias = alias
+        self.ping = ping
+        self.reset = reset
+        self.max_size = options.get('MAX_SIZE', 5)
+        self.timeout = options.get('TIMEOUT', 5)
+        self.max_lifetime = options.get('MAX_LIFETIME', 1800)
+        self.health_check_idle = options.get('HEALTH_CHECK_IDLE', 5)
+        # Свободные соединения: (соединение, время возврата в пул).
+        self._idle = collections.deque()
+        self._opened_at = {}
+        self._size = 0
+        self._condition = threading.Condition()
+        pool_connections.set(alias, 'max', value=self.max_size)
+        self._update_gauges()
+
+    def _update_gauges(self):
+        pool_connections.set(self.alias, 'idle', value=len(self._idle))
+        pool_connections.set(self.alias, 'in_use',
+                             value=self._size - len(self._idle))
+
+    def _take(self, deadline):
+        """Свободное соединение или None, если можно открыть новое."""
+        with self._condition:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    self._update_gauges()
+                    return entry
+                if self._size < self.max_size:
+                    self._size += 1
+                    self._update_gauges()
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f'Пул соединений {self.alias} занят '
+                        f'дольше {self.timeout} с')
+                self._condition.wait(remaining)
+
+    def _discard(self, raw):
+        self._opened_at.pop(id(raw), None)
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._size -= 1
+            self._update_gauges()
+            self._condition.notify()
+
+    def checkout(self, connect):
+        """Свободное соединение пула или новое, открытое connect()."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        try:
+            while True:
+                entry = self._take(deadline)
+                if entry is None:
+                    break
+                raw, returned_at = entry
+                if (time.monotonic() - returned_at < self.health_check_idle
+                        or self.ping(raw)):
+                    pool_checkouts.inc(self.alias, 'idle')
+                    return raw
+                self._discard(raw)
+        except PoolTimeout:
+            pool_checkouts.inc(self.alias, 'timeout')
+            raise
+        finally:
+            pool_checkout_duration.observe(
+                self.alias, value=time.monotonic() - started)
+        try:
+            raw = connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._update_gauges()
+                self._condition.notify()
+            raise
+        self._opened_at[id(raw)] = time.monotonic()
+        pool_checkouts.inc(self.alias, 'new')
+        return raw
+
+    def close_idle(self):
+        """Закрывает свободные соединения пула."""
+        with self._condition:
+            idle = list(self._idle)
+            self._idle.clear()
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def checkin(self, raw, discard=False):
+        now = time.monotonic()
+        expired = now - self._opened_at.get(id(raw), now) > self.max_lifetime
+        if discard or expired or not self.reset(raw):
+            self._discard(raw)
+            return
+        with self._condition:
+            self._idle.append((raw, now))
+            self._update_gauges()
+            self._condition.notify()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, factory):
+    """Пул алиаса в текущем процессе.
+
+    После fork (preload_app в gunicorn) соединения родителя не
+    используются: у каждого воркера свой пул.
+    """
+    key = (os.getpid(), alias)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                for other in [other for other in _pools
+                              if other[0] != key[0]]:
+                    del _pools[other]
+                pool = _pools[key] = factory()
+    return pool
+
+
+def close_pools():
+    """Закрывает соединения и забывает пулы текущего процесса.
+
+    Вызывается в мастере gunicorn перед fork (gunicorn.conf.py):
+    иначе воркер унаследовал бы открытые соединения пула, а выбросив
+    чужой пул, закрыл бы (PQfinish) сокет, общий с мастером.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_idle()
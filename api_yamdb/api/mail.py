@@ -0,0 +1,217 @@
+# api/mail.py
+"""Очередь исходящих писем.
+
+Запрос только ставит письмо в очередь; отправляют его фоновые потоки.
+Поток забирает из очереди пакет писем и отправляет их через одно
+соединение с почтовым сервером. Неотправленные письма повторяются
+с экспоненциальной задержкой, пока не кончатся попытки.
+
+Бэкенд задаётся настройкой API_MAIL_QUEUE: ThreadedMailQueue - пул
+фоновых потоков, ImmediateMailQueue - отправка сразу в запросе (тесты,
+отладка). Сами письма уходят через EMAIL_BACKEND, в тестах это locmem.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+mail_messages = Counter(
+    'api_mail_messages_total',
+    'Письма из очереди по результату отправки.',
+    ('result', ),
+)
+
+
+class BaseMailQueue:
+    def __init__(self, options):
+        self.max_retries = options.get('MAX_RETRIES', 5)
+        self.retry_backoff = options.get('RETRY_BACKOFF', 1.0)
+
+    def enqueue(self, message):
+        raise NotImplementedError
+
+    def flush(self, timeout=None):
+        """Ждёт отправки писем, уже стоящих в очереди."""
+        return True
+
+    def send_batch(self, batch):
+        """Отправляет пакет через одно соединение.
+
+        batch - список (письмо, номер попытки). Возвращает письма,
+        которые не удалось отправить, с тем же номером попытки.
+        """
+        failed = []
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception:
+            logger.exception('Почтовый сервер недоступен')
+            return batch
+        try:
+            for message, attempt in batch:
+                message.connection = connection
+                try:
+                    message.send()
+                except Exception:
+                    logger.exception('Письмо %s не отправлено', message.to)
+                    failed.append((message, attempt))
+                else:
+                    mail_messages.inc('sent')
+        finally:
+            connection.close()
+        return failed
+
+    def retry_delay(self, attempt):
+        return self.retry_backoff * 2 ** attempt
+
+
+class ImmediateMailQueue(BaseMailQueue):
+    """Отправляет письмо сразу в запросе, без фоновых потоков."""
+
+    def enqueue(self, message):
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                mail_messages.inc('retried')
+                time.sleep(self.retry_delay(attempt - 1))
+            if not self.send_batch([(message, attempt)]):
+                return
+        mail_messages.inc('failed')
+
+
+class ThreadedMailQueue(BaseMailQueue):
+    """Очередь в памяти процесса с пулом фоновых потоков."""
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.workers = options.get('WORKERS', 2)
+        self.batch_size = options.get('BATCH_SIZE', 50)
+        self.max_size = options.get('MAX_SIZE', 10000)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        # Письма, ждущие повтора по таймеру, а не в очереди.
+        self._delayed = 0
+
+    def _ensure_started(self):
+        # Потоки запускаются при первом письме в каждом процессе:
+        # после fork воркера gunicorn потоков родителя в нём нет.
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.max_size)
+            self._delayed = 0
+            for number in range(self.workers):
+                threading.Thread(
+                    target=self._work, args=(self._queue, ),
+                    name=f'mail-queue-{number}', daemon=True,
+                ).start()
+
+    def enqueue(self, message):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((message, 0))
+        except queue.Full:
+            # Очередь переполнена: письмо отправляется в запросе.
+            mail_messages.inc('overflow')
+            if self.send_batch([(message, 0)]):
+                mail_messages.inc('failed')
+
+    def _take_batch(self, work_queue):
+        batch = [work_queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(work_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self, work_queue):
+        while True:
+            batch = self._take_batch(work_queue)
+            try:
+                for message, attempt in self.send_batch(batch):
+                    self._retry(work_queue, message, attempt + 1)
+            finally:
+                for _ in batch:
+                    work_queue.task_done()
+
+    def _retry(self, work_queue, message, attempt):
+        if attempt > self.max_retries:
+            mail_messages.inc('failed')
+            logger.error('Письмо %s не отправлено за %s попыток',
+                         message.to, attempt)
+            return
+        mail_messages.inc('retried')
+        with self._lock:
+            self._delayed += 1
+        timer = threading.Timer(
+            self.retry_delay(attempt - 1), self._requeue,
+            args=(work_queue, message, attempt))
+        timer.daemon = True
+        timer.start()
+
+    def _requeue(self, work_queue, message, attempt):
+        # Повтор не отбрасывается и при полной очереди.
+        work_queue.put((message, attempt))
+        with self._lock:
+            self._delayed -= 1
+
+    def flush(self, timeout=None):
+        if self._queue is None or self._pid != os.getpid():
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks or self._delayed:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+
+_mail_queue = None
+
+
+def get_mail_queue():
+    global _mail_queue
+    if _mail_queue is None:
+        config = settings.API_MAIL_QUEUE
+        backend = import_string(config['BACKEND'])
+        _mail_queue = backend(config.get('OPTIONS', {}))
+    return _mail_queue
+
+
+@receiver(setting_changed)
+def reset_mail_queue(setting, **kwargs):
+    global _mail_queue
+    if setting == 'API_MAIL_QUEUE':
+        if _mail_queue is not None:
+            _mail_queue.flush(timeout=5)
+        _mail_queue = None
+
+
+@atexit.register
+def flush_mail_queue():
+    """При остановке процесса даёт дослать уже принятые письма."""
+    if _mail_queue is not None:
+        _mail_queue.flush(
+            timeout=settings.API_MAIL_QUEUE.get('SHUTDOWN_TIMEOUT', 10))
+
+
+def queue_mail(subject, body, recipient_list, from_email=None):
+    """Ставит письмо в очередь отправки."""
+    get_mail_queue().enqueue(EmailMessage(
+        subject=subject, body=body, from_email=from_email,
+        to=recipient_list,
+    ))
@@ -0,0 +1,72 @@
+"""Management-команда. Сравнивает накладные расходы middleware.
+Синтаксис:
+python manage.py benchmark_middleware [--requests N]
+
+Запросы к пустому представлению проходят через полный стандартный
+набор middleware и через набор из settings.MIDDLEWARE; разница
+времени на запрос - это работа, которую экономит пропуск API-путей.
+"""
+import time
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import path
+
+FULL_MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+
+def ping(request):
+    return HttpResponse('ok')
+
+
+urlpatterns = [
+    path('api/v1/ping/', ping),
+    path('admin/ping/', ping),
+]
+
+
+def measure(middleware, url, requests):
+    """Среднее время обработки запроса в микросекундах."""
+    with override_settings(MIDDLEWARE=middleware, ROOT_URLCONF=__name__):
+        handler = BaseHandler()
+        handler.load_middleware()
+        factory = RequestFactory()
+        handler.get_response(factory.get(url))
+        batch = [factory.get(url, HTTP_COOKIE='sessionid=benchmark')
+                 for _ in range(requests)]
+        started = time.perf_counter()
+        for request in batch:
+            handler.get_response(request)
+        elapsed = time.perf_counter() - started
+    return elapsed / requests * 1000000
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает время middleware для API и для полного набора.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=5000,
+            help='Количество запросов на каждый замер.')
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        for url in ('/api/v1/ping/', '/admin/ping/'):
+            full = measure(FULL_MIDDLEWARE, url, requests)
+            current = measure(settings.MIDDLEWARE, url, requests)
+            saved = full - current
+            self.stdout.write(
+                f'{url}: полный набор {full:.1f} мкс, '
+                f'settings.MIDDLEWARE {current:.1f} мкс, '
+                f'экономия {saved:.1f} мкс ({saved / full:.0%})')
@@ -0,0 +1,182 @@
+"""Management-команда. Нагрузочный тест gunicorn в разных режимах.
+Синтаксис:
+python manage.py loadtest [--modes sync,gthread,gevent] [--path URL]
+                          [--concurrency N] [--duration SEC]
+                          [--target http://host:port]
+
+Для каждого режима запускается gunicorn с gunicorn.conf.py
+(GUNICORN_WORKER_CLASS=режим) на свободном порту, N клиентских потоков
+с keep-alive соединениями шлют GET-запросы DURATION секунд. Выводятся
+запросы в секунду, ошибки и перцентили задержки. С --target
+нагружается уже запущенный сервер.
+"""
+import http.client
+import importlib.util
+import itertools
+import os
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MODES = ('sync', 'gthread', 'gevent')
+START_TIMEOUT = 30
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run_load(base_url, paths, concurrency, duration):
+    """Нагружает сервер; возвращает словарь с результатами замера."""
+    address = urlsplit(base_url)
+    deadline = time.perf_counter() + duration
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client(offset):
+        own_latencies = []
+        own_errors = 0
+        connection = http.client.HTTPConnection(
+            address.hostname, address.port, timeout=10)
+        for path in itertools.islice(itertools.cycle(paths), offset, None):
+            if time.perf_counter() >= deadline:
+                break
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                own_errors += 1
+                connection.close()
+                continue
+            # 4xx тоже ошибка: 429 от троттлинга или 404 на неверном
+            # пути дали бы быстрые ответы и завысили запросы в секунду.
+            if not (200 <= response.status < 300 or response.status == 304):
+                own_errors += 1
+                continue
+            own_latencies.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            latencies.extend(own_latencies)
+            errors.append(own_errors)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(number, ))
+               for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.5) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process):
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('gunicorn завершился при запуске')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f'gunicorn не открыл порт {port} '
+                       f'за {START_TIMEOUT} с')
+
+
+def start_gunicorn(executable, mode, port):
+    environment = dict(os.environ, GUNICORN_WORKER_CLASS=mode)
+    process = subprocess.Popen(
+        [executable, 'api_yamdb.wsgi:application',
+         '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}'],
+        cwd=settings.BASE_DIR, env=environment,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, process)
+    except CommandError:
+        process.kill()
+        process.wait()
+        raise
+    return process
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность режимов воркеров gunicorn.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modes', default='sync,gthread,gevent',
+            help='Режимы воркеров через запятую.')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Адрес для запросов; можно указать несколько раз.')
+        parser.add_argument(
+            '--concurrency', type=int, default=32,
+            help='Число одновременных клиентов.')
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность замера одного режима, сек.')
+        parser.add_argument(
+            '--target',
+            help='Нагрузить запущенный сервер вместо запуска gunicorn.')
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name}: {result["rps"]:.1f} запросов/с, '
+            f'{result["requests"]} запросов, {result["errors"]} ошибок, '
+            f'p50 {result["p50"]:.1f} мс, p95 {result["p95"]:.1f} мс, '
+            f'p99 {result["p99"]:.1f} мс')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/api/v1/titles/']
+        load = (paths, options['concurrency'], options['duration'])
+        if options['target']:
+            self.report(options['target'],
+                        run_load(options['target'], *load))
+            return
+        executable = shutil.which('gunicorn')
+        if executable is None:
+            raise CommandError('gunicorn не установлен')
+        for mode in options['modes'].split(','):
+            if mode not in MODES:
+                raise CommandError(f'Неизвестный режим: {mode}')
+            if mode == 'gevent' and importlib.util.find_spec(
+                    'gevent') is None:
+                self.stdout.write('gevent: пропущен, пакет не установлен')
+                continue
+            port = free_port()
+            process = start_gunicorn(executable, mode, port)
+            base_url = f'http://127.0.0.1:{port}'
+            try:
+                # Прогрев: импорт лениво загружаемых модулей, соединения
+                # с БД и кэши воркеров не должны попасть в замер.
+                run_load(base_url, paths, options['concurrency'], 1)
+                self.report(mode, run_load(base_url, *load))
+            finally:
+                process.terminate()
+                process.wait()
@@ -0,0 +1,127 @@
+# api/metrics.py
+"""Счётчики, измерители и гистограммы процесса в текстовом формате Prometheus.
+
+Значения живут в памяти процесса: при нескольких воркерах gunicorn
+каждый отдаёт свои, а суммирует их сборщик метрик.
+"""
+import threading
+
+from django.http import HttpResponse
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = []
+
+
+def format_labels(labelnames, labelvalues):
+    if not labelnames:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(labelnames, labelvalues)
+    )
+    return '{' + pairs + '}'
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            yield self.name, self.labelnames, labelvalues, value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.kind}']
+        for name, labelnames, labelvalues, value in self.samples():
+            labels = format_labels(labelnames, labelvalues)
+            lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = (
+                self._values.get(labelvalues, 0) + amount)
+
+    def value(self, *labelvalues):
+        with self._lock:
+            return self._values.get(labelvalues, 0)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, *labelvalues, value):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def value(self, *labelvalues):
+        with self._lock:
+            return self._values.get(labelvalues, 0)
+
+
+class Histogram(Metric):
+    """Гистограмма с накопительными корзинами le, как в Prometheus."""
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                       5.0, 10.0)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets or self.DEFAULT_BUCKETS)
+
+    def observe(self, *labelvalues, value):
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                # Счётчики корзин, затем +Inf, сумма.
+                entry = self._values[labelvalues] = (
+                    [0] * (len(self.buckets) + 1) + [0.0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[index] += 1
+            entry[-2] += 1
+            entry[-1] += value
+
+    def count(self, *labelvalues):
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            return entry[-2] if entry else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labelvalues, list(entry))
+                           for labelvalues, entry in self._values.items())
+        labelnames = self.labelnames + ('le', )
+        for labelvalues, entry in items:
+            bounds = [repr(float(bound)) for bound in self.buckets]
+            for bound, value in zip(bounds + ['+Inf'], entry):
+                yield (f'{self.name}_bucket', labelnames,
+                       labelvalues + (bound, ), value)
+            yield f'{self.name}_sum', self.labelnames, labelvalues, entry[-1]
+            yield (f'{self.name}_count', self.labelnames, labelvalues,
+                   entry[-2])
+
+
+def render_metrics():
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
+
+
+def metrics_view(request):
+    """Отдаёт метрики процесса для сборщика."""
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
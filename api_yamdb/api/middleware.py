@@ -0,0 +1,182 @@
+# api/middleware.py
+"""Middleware API.
+
+RequestTimingMiddleware замеряет каждый запрос: число и время запросов
+к БД, время сериализации ответа и общее время. Замеры отдаются
+заголовком Server-Timing и копятся в гистограммах /metrics по имени
+представления (TitleViewSet.list, ReviewViewSet.create и т.п.).
+Заголовок выключен по умолчанию и отдаётся только администраторам:
+он раскрывает время работы сервера и не должен попадать в кэш nginx.
+
+Остальные классы пропускают запросы к API. API аутентифицируется
+токеном, поэтому сессии, CSRF, сообщения и X-Frame-Options ему
+не нужны. Подклассы стандартных middleware
+пропускают пути из API_MIDDLEWARE_SKIP_PREFIXES и полностью работают
+для /admin/ и остального сайта. Подклассы, а не замена, нужны затем,
+что проверки django.contrib.admin ищут эти классы в MIDDLEWARE.
+"""
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import connections
+from django.middleware.clickjacking import XFrameOptionsMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+
+from .metrics import Counter, Histogram
+
+request_duration = Histogram(
+    'api_request_duration_seconds',
+    'Время обработки запроса.',
+    ('view', 'method', 'status'),
+)
+request_db_duration = Histogram(
+    'api_request_db_duration_seconds',
+    'Суммарное время запросов к БД за один запрос.',
+    ('view', ),
+)
+request_db_queries = Counter(
+    'api_request_db_queries_total',
+    'Запросы к БД, выполненные при обработке запросов.',
+    ('view', ),
+)
+request_serialize_duration = Histogram(
+    'api_request_serialize_duration_seconds',
+    'Время сериализации (рендеринга) ответа.',
+    ('view', ),
+)
+
+# Текущий запрос: по нему журнал медленных запросов (api/slow_queries.py)
+# находит представление, выполнившее SQL.
+current_request = ContextVar('api_current_request', default=None)
+
+
+class QueryTimer:
+    """execute_wrapper: считает запросы к БД и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+def get_view_name(request):
+    """Имя представления для меток: Класс.действие или имя функции."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    func = match.func
+    view_class = getattr(func, 'cls', None)
+    if view_class is None:
+        return getattr(func, '__name__', 'unknown')
+    actions = getattr(func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{view_class.__name__}.{action}'
+    return view_class.__name__
+
+
+class RequestTimingMiddleware:
+    """Замеряет запрос; должен стоять первым в MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        timer = QueryTimer()
+        request._serialize_duration = 0.0
+        token = current_request.set(request)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        total = time.perf_counter() - started
+
+        view = get_view_name(request)
+        serialize = request._serialize_duration
+        request_duration.observe(
+            view, request.method, f'{response.status_code // 100}xx',
+            value=total)
+        request_db_duration.observe(view, value=timer.duration)
+        request_db_queries.inc(view, amount=timer.count)
+        request_serialize_duration.observe(view, value=serialize)
+        user = getattr(request, 'user', None)
+        if (settings.API_SERVER_TIMING and user is not None
+                and user.is_authenticated and user.is_administrator):
+            app = max(total - timer.duration - serialize, 0)
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={timer.duration * 1000:.1f};'
+                f'desc="{timer.count} queries"',
+                f'serialize;dur={serialize * 1000:.1f}',
+                f'app;dur={app * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ))
+        return response
+
+    def process_template_response(self, request, response):
+        # Вызывается прямо перед render(): время рендеринга ответа DRF
+        # (JSON и т.п.) замеряется до колбэка после рендеринга.
+        started = time.perf_counter()
+
+        def finish(rendered):
+            request._serialize_duration += time.perf_counter() - started
+
+        response.add_post_render_callback(finish)
+        return response
+
+
+def is_api_request(request):
+    return request.path_info.startswith(
+        tuple(settings.API_MIDDLEWARE_SKIP_PREFIXES))
+
+
+class SkipApiMixin:
+    """Передаёт запрос к API дальше, не вызывая хуки middleware."""
+
+    def __call__(self, request):
+        if is_api_request(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class ApiSkippingSessionMiddleware(SkipApiMixin, SessionMiddleware):
+    pass
+
+
+class ApiSkippingCsrfViewMiddleware(SkipApiMixin, CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        # process_view вызывается обработчиком отдельно от __call__.
+        if is_api_request(request):
+            return None
+        return super().process_view(
+            request, callback, callback_args, callback_kwargs)
+
+
+class ApiSkippingAuthenticationMiddleware(SkipApiMixin,
+                                          AuthenticationMiddleware):
+    pass
+
+
+class ApiSkippingMessageMiddleware(SkipApiMixin, MessageMiddleware):
+    pass
+
+
+class ApiSkippingXFrameOptionsMiddleware(SkipApiMixin,
+                                         XFrameOptionsMiddleware):
+    pass
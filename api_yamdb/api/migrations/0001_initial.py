@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:27
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True, verbose_name='Отпечаток')),
+                ('sql', models.TextField(verbose_name='Нормализованный SQL')),
+                ('view', models.CharField(max_length=255, verbose_name='Представление')),
+                ('database', models.CharField(max_length=64, verbose_name='База данных')),
+                ('count', models.PositiveIntegerField(default=1, verbose_name='Количество')),
+                ('total_duration', models.FloatField(verbose_name='Суммарное время, с')),
+                ('max_duration', models.FloatField(verbose_name='Наибольшее время, с')),
+                ('plan', models.TextField(blank=True, verbose_name='План запроса')),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='Впервые')),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последний раз')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ('-total_duration',),
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import models
+from django.utils import timezone
+
+
+class SlowQuery(models.Model):
+    """Медленный запрос к БД, сгруппированный по отпечатку."""
+    fingerprint = models.CharField(
+        verbose_name='Отпечаток',
+        max_length=40,
+        unique=True,
+    )
+    sql = models.TextField(verbose_name='Нормализованный SQL')
+    view = models.CharField(
+        verbose_name='Представление',
+        max_length=255,
+    )
+    database = models.CharField(
+        verbose_name='База данных',
+        max_length=64,
+    )
+    count = models.PositiveIntegerField(
+        verbose_name='Количество',
+        default=1,
+    )
+    total_duration = models.FloatField(verbose_name='Суммарное время, с')
+    max_duration = models.FloatField(verbose_name='Наибольшее время, с')
+    plan = models.TextField(verbose_name='План запроса', blank=True)
+    first_seen = models.DateTimeField(
+        verbose_name='Впервые',
+        auto_now_add=True,
+    )
+    last_seen = models.DateTimeField(
+        verbose_name='Последний раз',
+        default=timezone.now,
+    )
+
+    class Meta:
+        ordering = ('-total_duration', )
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+
+    def __str__(self):
+        return self.sql[:80]
+
+    @property
+    def average_duration(self):
+        return self.total_duration / self.count
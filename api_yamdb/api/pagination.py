@@ -0,0 +1,61 @@
+# api/pagination.py
+from rest_framework.pagination import (CursorPagination,
+                                       LimitOffsetPagination,
+                                       PageNumberPagination)
+from rest_framework.settings import api_settings
+
+from reviews.utils import PubDateIdOrder
+
+
+class IdCursorPagination(CursorPagination):
+    """Keyset-пагинация по порядку '-id' из PubDateIdOrder.Meta.
+
+    Страница выбирается условием по id, без OFFSET и без COUNT(*),
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    """
+    ordering = PubDateIdOrder._meta.ordering
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+
+
+class CursorOptInMixin:
+    """Включает курсорный режим, если в запросе передан параметр cursor.
+
+    Первая страница запрашивается с пустым значением (?cursor=),
+    дальше клиент идёт по ссылкам next/previous. Без параметра
+    работает исходная пагинация, и старые клиенты её не замечают.
+    """
+    cursor_pagination_class = IdCursorPagination
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        if cursor_param not in request.query_params:
+            self.cursor_paginator = None
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = self.cursor_pagination_class()
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is None:
+            return super().get_paginated_response(data)
+        return self.cursor_paginator.get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.cursor_paginator is None:
+            return super().get_html_context()
+        return self.cursor_paginator.get_html_context()
+
+    def to_html(self):
+        if self.cursor_paginator is None:
+            return super().to_html()
+        return self.cursor_paginator.to_html()
+
+
+class LimitOffsetOrCursorPagination(CursorOptInMixin, LimitOffsetPagination):
+    """limit/offset по умолчанию, курсор по запросу."""
+
+
+class PageNumberOrCursorPagination(CursorOptInMixin, PageNumberPagination):
+    """Нумерация страниц по умолчанию, курсор по запросу."""
@@ -21,7 +21,9 @@ class IsAuthorCanUpdateOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return bool(request.user == obj.author or request.user.is_administrator
+        # author_id, а не author: объект автора для проверки не нужен.
+        return bool(request.user.pk == obj.author_id
+                    or request.user.is_administrator
                     or request.user.is_moderator)
 
 
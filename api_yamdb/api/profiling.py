@@ -0,0 +1,143 @@
+# api/profiling.py
+"""Профилирование запросов в рабочем окружении по требованию.
+
+ProfilingMiddleware запускает cProfile для доли запросов SAMPLE_RATE
+или для запроса с подписанным заголовком (HEADER), который выдаёт
+администратору /api/v1/profiles/. Профиль пишется в каталог DIRECTORY
+в формате pstats; каталог - кольцевой буфер на MAX_FILES файлов,
+старые удаляются. Каждый воркер gunicorn пишет в общий каталог сам,
+имя файла содержит pid.
+
+Подписанный заголовок действует TOKEN_MAX_AGE секунд и один раз:
+его nonce отмечается в общем кэше CACHE_ALIAS. Владелец токена
+при проверке должен всё ещё быть администратором.
+
+Посмотреть профиль: python -m pstats <файл> или snakeviz <файл>.
+"""
+import cProfile
+import os
+import random
+import re
+import secrets
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+
+from reviews.models import User
+
+from .middleware import get_view_name
+
+SIGNING_SALT = 'api.profiling'
+NONCE_KEY_PREFIX = 'profile-token:'
+PROFILE_NAME_RE = re.compile(r'^[\w.-]+\.prof$')
+
+
+def get_directory():
+    return settings.API_PROFILING['DIRECTORY']
+
+
+def make_profile_token(user):
+    """Значение заголовка, включающего профилирование одного запроса."""
+    return signing.dumps({'user': user.pk, 'nonce': secrets.token_hex(16)},
+                         salt=SIGNING_SALT)
+
+
+def check_profile_token(value):
+    config = settings.API_PROFILING
+    try:
+        payload = signing.loads(value, salt=SIGNING_SALT,
+                                max_age=config['TOKEN_MAX_AGE'])
+    except signing.BadSignature:
+        return False
+    nonce = payload.get('nonce')
+    user = User.objects.filter(pk=payload.get('user'),
+                               is_active=True).first()
+    if nonce is None or user is None or not user.is_administrator:
+        return False
+    # add не перезаписывает ключ: второй запрос с тем же токеном
+    # получит False в любом воркере.
+    return caches[config['CACHE_ALIAS']].add(
+        f'{NONCE_KEY_PREFIX}{nonce}', 1, config['TOKEN_MAX_AGE'])
+
+
+def list_profiles():
+    """Профили буфера, новые первыми: [(имя, размер, mtime)]."""
+    directory = get_directory()
+    try:
+        names = [name for name in os.listdir(directory)
+                 if PROFILE_NAME_RE.match(name)]
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        profiles.append((name, stat.st_size, stat.st_mtime))
+    return sorted(profiles, key=lambda profile: profile[2], reverse=True)
+
+
+def profile_path(name):
+    """Путь к профилю по имени; None для чужих и несуществующих имён."""
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    path = os.path.join(get_directory(), name)
+    return path if os.path.isfile(path) else None
+
+
+def save_profile(profiler, view_name, duration):
+    directory = get_directory()
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r'[^\w.-]', '_', view_name)
+    name = '{}-{}-{}-{:.0f}ms.prof'.format(
+        time.strftime('%Y%m%dT%H%M%S'), os.getpid(), slug, duration * 1000)
+    temporary_path = os.path.join(directory, f'.{name}.tmp')
+    profiler.dump_stats(temporary_path)
+    os.replace(temporary_path, os.path.join(directory, name))
+    prune_profiles()
+    return name
+
+
+def prune_profiles():
+    """Оставляет в каталоге MAX_FILES самых новых профилей."""
+    directory = get_directory()
+    for name, _, _ in list_profiles()[settings.API_PROFILING['MAX_FILES']:]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            # Его уже удалил другой воркер.
+            pass
+
+
+class ProfilingMiddleware:
+    """Профилирует выбранные запросы; выключен при SAMPLE_RATE=0
+    и без подписанного заголовка."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        config = settings.API_PROFILING
+        token = request.META.get(
+            'HTTP_' + config['HEADER'].upper().replace('-', '_'))
+        if token:
+            return check_profile_token(token)
+        return random.random() < config['SAMPLE_RATE']
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        name = save_profile(profiler, get_view_name(request),
+                            time.perf_counter() - started)
+        response['X-Profile-Id'] = name
+        return response
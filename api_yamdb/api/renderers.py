@@ -0,0 +1,68 @@
+# api/renderers.py
+"""Быстрые рендереры ответов API.
+
+FastJSONRenderer сериализует через orjson, если пакет установлен,
+иначе работает как JSONRenderer DRF; вывод совпадает с ним: UTF-8 без
+экранирования, без пробелов. orjson умеет только такой вывод, поэтому
+при UNICODE_JSON, COMPACT_JSON или STRICT_JSON не по умолчанию, как
+и с отступами, рендерит JSONRenderer. NaN и бесконечность orjson пишет
+как null, а не отказывает, как строгий JSONRenderer; в ответах API их
+нет - рейтинг считается из целых сумм и количеств.
+
+MessagePackRenderer отдаёт ответ в MessagePack по Accept:
+application/msgpack (или ?format=msgpack); в настройках он
+подключается, только если установлен msgpack.
+
+Типы, которых нет в JSON (Decimal, ленивые строки и т.п.), приводятся
+тем же JSONEncoder DRF, что и в стандартном рендерере.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+default_encoder = JSONEncoder()
+if orjson is not None:
+    # Ключи-числа - строками, как в json; даты - через JSONEncoder DRF
+    # с его форматом (миллисекунды, Z).
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def use_orjson(self, data, accepted_media_type, renderer_context):
+        return (orjson is not None and data is not None
+                and not self.ensure_ascii and self.compact and self.strict
+                and not self.get_indent(accepted_media_type,
+                                        renderer_context or {}))
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not self.use_orjson(data, accepted_media_type, renderer_context):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        content = orjson.dumps(
+            data, default=default_encoder.default, option=ORJSON_OPTIONS)
+        # Как JSONRenderer: эти символы недопустимы в JavaScript-строках.
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=default_encoder.default,
+                             use_bin_type=True)
@@ -0,0 +1,121 @@
+# api/replicas.py
+"""Чтение с реплик БД.
+
+Безопасные запросы (GET, HEAD, OPTIONS) к вьюсетам с ReplicaReadMixin
+читают с одной из реплик API_REPLICAS['ALIASES'], выбранной на весь
+запрос; запись и остальные запросы идут в основную БД. Выбор живёт
+в контекстной переменной запроса, ReplicaRouter только читает её.
+
+Реплика отстаёт от основной БД. Чтобы пользователь сразу видел свой
+новый отзыв, после успешного изменяющего запроса он на STICKY_SECONDS
+закрепляется за основной БД. Следующий запрос обычно попадает в другой
+воркер gunicorn, поэтому отметка хранится в кэше CACHE_ALIAS, общем для
+процессов (memcached в docker-compose). С кэшем в памяти процесса
+(LocMemCache) гарантия не выполнялась бы, и реплики с ним не
+включаются: check_pin_cache останавливает запуск.
+
+Ответ, который кладётся в кэш ответов (api/cache.py), всегда строится
+по основной БД, иначе кэш надолго сохранил бы отставание реплики.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework import permissions
+
+from .cache import is_shared_cache
+
+PIN_KEY_PREFIX = 'api:replica-pin:'
+
+_replica = ContextVar('api_replica', default=None)
+
+
+def get_replicas():
+    return settings.API_REPLICAS['ALIASES']
+
+
+def check_pin_cache():
+    alias = settings.API_REPLICAS['CACHE_ALIAS']
+    if get_replicas() and not is_shared_cache(alias):
+        raise ImproperlyConfigured(
+            f'Реплики БД требуют общего для процессов кэша, а кэш '
+            f'{alias!r} локальный: автор изменения читал бы с реплики')
+
+
+def pin_cache():
+    return caches[settings.API_REPLICAS['CACHE_ALIAS']]
+
+
+def pin_to_primary(user):
+    pin_cache().set(f'{PIN_KEY_PREFIX}{user.pk}', 1,
+                    settings.API_REPLICAS['STICKY_SECONDS'])
+
+
+def is_pinned(user):
+    return (user.is_authenticated
+            and pin_cache().get(f'{PIN_KEY_PREFIX}{user.pk}') is not None)
+
+
+class ReplicaRouter:
+    """Чтение с реплики, выбранной для текущего запроса, запись -
+    в основную БД. Вне вьюсетов (админка, команды) всё идёт в неё."""
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        # Иначе объект, прочитанный с реплики, сохранялся бы туда же
+        # по instance._state.db.
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in get_replicas():
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему на реплики переносит репликация.
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Читает безопасные запросы вьюсета с реплики."""
+    replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        replicas = get_replicas()
+        if (replicas and request.method in permissions.SAFE_METHODS
+                and not is_pinned(request.user)):
+            self.replica_token = _replica.set(random.choice(replicas))
+        super().initial(request, *args, **kwargs)
+
+    def fill_cached_response(self, handler, request, *args, **kwargs):
+        # Ответ ляжет в кэш под версиями, прочитанными до запроса:
+        # с отстающей реплики он был бы старее их до следующей записи.
+        token = _replica.set(None)
+        try:
+            return super().fill_cached_response(
+                handler, request, *args, **kwargs)
+        finally:
+            _replica.reset(token)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.replica_token is not None:
+            _replica.reset(self.replica_token)
+            self.replica_token = None
+        if (get_replicas()
+                and request.method not in permissions.SAFE_METHODS
+                and response.status_code < 400
+                and request.user.is_authenticated):
+            pin_to_primary(request.user)
+        return super().finalize_response(
+            request, response, *args, **kwargs)
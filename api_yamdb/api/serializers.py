@@ -1,7 +1,8 @@
 # api/serializers.py
 import datetime as dt
-from django.shortcuts import get_object_or_404
-from rest_framework import serializers
+from django.db import IntegrityError, transaction
+from rest_framework import permissions, serializers
+from rest_framework.settings import api_settings
 from reviews.models import User
 from reviews.utils import check_username
 from api_yamdb.settings import (
@@ -12,6 +13,12 @@ from api_yamdb.settings import (
 from reviews.models import Title, Genre, Category, Review, Comment
 
 
+TITLE_HIDDEN_FIELDS = (
+    'score_sum',
+    'review_count',
+    'modified',
+)
+
 USER_MODEL_FIELDS = (
     'username',
     'email',
@@ -22,7 +29,36 @@ USER_MODEL_FIELDS = (
 )
 
 
-class UserSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """?fields=a,b в безопасном запросе: сериализатор строит и заполняет
+    только эти поля. Неизвестные имена пропускаются, без подходящих
+    имён отдаются все поля. Вложенные сериализаторы параметр не видят.
+    """
+    fields_param = 'fields'
+
+    def get_requested_fields(self):
+        request = self.context.get('request')
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if (request is None or parent is not None
+                or request.method not in permissions.SAFE_METHODS):
+            return None
+        value = request.query_params.get(self.fields_param)
+        if not value:
+            return None
+        return {name.strip() for name in value.split(',')}
+
+    def get_field_names(self, declared_fields, info):
+        field_names = super().get_field_names(declared_fields, info)
+        requested = self.get_requested_fields()
+        if requested is None:
+            return field_names
+        selected = [name for name in field_names if name in requested]
+        return selected or field_names
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = USER_MODEL_FIELDS
@@ -107,7 +143,7 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ('name', 'slug')
 
 
-class TitleReadSerializer(serializers.ModelSerializer):
+class TitleReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     genre = GenreSerializer(
         read_only=True,
         many=True
@@ -123,7 +159,7 @@ class TitleReadSerializer(serializers.ModelSerializer):
     )
 
     class Meta:
-        fields = '__all__'
+        exclude = TITLE_HIDDEN_FIELDS
         model = Title
 
     def validate_year(self, value):
@@ -146,11 +182,11 @@ class TitleUpdateSerializer(TitleReadSerializer):
     )
 
     class Meta:
-        fields = '__all__'
+        exclude = TITLE_HIDDEN_FIELDS
         model = Title
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         slug_field='username',
         read_only=True,
@@ -163,7 +199,20 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'pub_date', 'review',)
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+def violates_rating_once(error):
+    """Нарушено ли ограничение rating_once (один отзыв автора)."""
+    diag = getattr(error.__cause__, 'diag', None)
+    if diag is not None:
+        return diag.constraint_name == 'rating_once'
+    # SQLite не сообщает имя ограничения, только его колонки.
+    table = Review._meta.db_table
+    columns = ', '.join(
+        f'{table}.{Review._meta.get_field(name).column}'
+        for name in ('author', 'title'))
+    return str(error) == f'UNIQUE constraint failed: {columns}'
+
+
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         slug_field='username',
         read_only=True,
@@ -175,17 +224,19 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('id', 'pub_date', 'title',)
 
-    def validate(self, data):
-        user = get_object_or_404(User, username=self.context['request'].user)
-        title_id = self.context['view'].kwargs.get('title_id')
-        is_review = Review.objects.filter(
-            author=user,
-            title=title_id
-        ).exists()
-
-        if is_review and self.context['request'].method == 'POST':
-            raise serializers.ValidationError(
-                'Пользователь может оставить '
-                'только один отзыв на произведение.'
-            )
-        return data
+    def save(self, **kwargs):
+        """Один отзыв автора на произведение обеспечивает ограничение
+        rating_once в БД, без отдельного запроса перед вставкой."""
+        creating = self.instance is None
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError as error:
+            if not creating or not violates_rating_once(error):
+                raise
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    'Пользователь может оставить '
+                    'только один отзыв на произведение.'
+                ],
+            })
@@ -0,0 +1,72 @@
+# api/signals.py
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from reviews.models import Category, Genre, GenreTitle, Review, Title, User
+from reviews.signals import bulk_loaded
+from .authentication import principal_resource
+from .cache import bump_version, title_resource
+
+RESOURCE_BY_MODEL = {
+    Title: 'titles',
+    Genre: 'genres',
+    Category: 'categories',
+    Review: 'reviews',
+}
+
+
+def invalidate_resource(resource, using=None):
+    """Сбрасывает версию сразу и ещё раз после коммита.
+
+    Второй сброс нужен, чтобы ответ, построенный другим запросом
+    по данным до коммита, не остался под новой версией.
+    """
+    bump_version(resource)
+    transaction.on_commit(lambda: bump_version(resource), using=using)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_responses(sender, using=None, **kwargs):
+    resource = RESOURCE_BY_MODEL.get(sender)
+    if resource is not None:
+        invalidate_resource(resource, using=using)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_title(sender, instance, using=None, **kwargs):
+    """Рейтинг в ответе одного произведения зависит только от его
+    отзывов: список произведений сбрасывает версия reviews, ответ
+    произведения - его собственная (title_resource)."""
+    title_ids = {instance.title_id,
+                 getattr(instance, '_loaded_title_id', None)}
+    for title_id in title_ids - {None}:
+        invalidate_resource(title_resource(title_id), using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_principal(sender, instance, using=None, **kwargs):
+    """Роль и флаги пользователя перечитываются при следующем запросе."""
+    invalidate_resource(principal_resource(instance.pk), using=using)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def invalidate_title_genres(sender, action, using=None, **kwargs):
+    if action.startswith('post_'):
+        invalidate_resource('titles', using=using)
+
+
+@receiver(bulk_loaded)
+def invalidate_after_bulk_load(sender, using=None, **kwargs):
+    resource = RESOURCE_BY_MODEL.get(sender)
+    if sender is GenreTitle:
+        resource = 'titles'
+    if resource is not None:
+        invalidate_resource(resource, using=using)
+    if sender is Review:
+        # Ответ произведения завязан на его собственную версию; после
+        # загрузки в обход save() сбрасываются все произведения.
+        invalidate_resource('titles', using=using)
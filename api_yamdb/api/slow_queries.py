@@ -0,0 +1,235 @@
+# api/slow_queries.py
+"""Журнал медленных запросов к БД.
+
+log_slow_queries - execute_wrapper, который ставится на каждое
+соединение (api/signals.py). Запрос дольше THRESHOLD_MS пишется в лог
+вместе с представлением, которое его выполнило, и нормализованным
+текстом: литералы заменены на %s, списки IN и VALUES свёрнуты, поэтому
+запросы, отличающиеся только параметрами, дают один отпечаток.
+
+Отпечатки копятся в таблице SlowQuery (админка): число запросов,
+суммарное и наибольшее время. Для первого запроса с новым отпечатком
+сохраняется план: EXPLAIN (ANALYZE off) в PostgreSQL, EXPLAIN QUERY PLAN
+в SQLite. Параметры запросов не сохраняются - в них бывают адреса
+почты и коды подтверждения.
+
+Запись в SlowQuery и EXPLAIN выполняет фоновый поток процесса на своих
+соединениях в режиме autocommit. В транзакции запроса запись пропала бы
+при её откате, а строка частого отпечатка оставалась бы заблокированной
+до коммита и выстраивала бы в очередь параллельные запросы.
+"""
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .metrics import Counter
+from .middleware import current_request, get_view_name
+
+logger = logging.getLogger(__name__)
+
+slow_queries = Counter(
+    'api_slow_queries_total',
+    'Запросы к БД дольше порога API_SLOW_QUERIES.',
+    ('view', ),
+)
+slow_queries_dropped = Counter(
+    'api_slow_queries_dropped_total',
+    'Медленные запросы, не сохранённые из-за переполнения очереди.',
+    (),
+)
+
+EXPLAIN_PREFIXES = {
+    'postgresql': 'EXPLAIN (ANALYZE off) ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+REPEATED_LIST_RE = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+SPACE_RE = re.compile(r'\s+')
+
+# Свои запросы журнала (EXPLAIN, запись в SlowQuery) тоже идут через
+# обёртку; флаг не даёт им попасть в журнал.
+_local = threading.local()
+
+
+def normalize_sql(sql):
+    """Текст запроса без значений: основа отпечатка."""
+    sql = STRING_RE.sub('%s', sql)
+    sql = NUMBER_RE.sub('%s', sql)
+    sql = LIST_RE.sub('(...)', sql)
+    sql = REPEATED_LIST_RE.sub('(...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode('utf-8')).hexdigest()
+
+
+def explain(connection, sql, params):
+    """План запроса или '' для изменяющих запросов и других СУБД."""
+    prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+    statement = sql.lstrip()[:6].upper()
+    if prefix is None or not statement.startswith(('SELECT', 'WITH')):
+        return ''
+    # Ошибка EXPLAIN в PostgreSQL прервала бы транзакцию записи
+    # журнала, поэтому он выполняется в точке сохранения.
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+
+def store_slow_query(connection, sql, params, many, normalized, duration,
+                     view, now):
+    from .models import SlowQuery
+
+    using = router.db_for_write(SlowQuery)
+    key = fingerprint(normalized)
+    with transaction.atomic(using=using):
+        updated = SlowQuery.objects.using(using).filter(
+            fingerprint=key).update(
+                count=F('count') + 1,
+                total_duration=F('total_duration') + duration,
+                max_duration=Greatest(F('max_duration'), Value(duration)),
+                view=view,
+                last_seen=now,
+        )
+        if updated:
+            return
+        plan = ''
+        if settings.API_SLOW_QUERIES['EXPLAIN'] and not many:
+            plan = explain(connection, sql, params)
+        SlowQuery.objects.using(using).create(
+            fingerprint=key, sql=normalized, view=view,
+            database=connection.alias, total_duration=duration,
+            max_duration=duration, plan=plan, last_seen=now)
+
+
+class SlowQueryWriter:
+    """Фоновый поток, сохраняющий медленные запросы в SlowQuery."""
+
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+
+    def _ensure_started(self):
+        # Как у очереди писем: после fork воркера gunicorn потока
+        # родителя в нём нет.
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.max_pending)
+            threading.Thread(
+                target=self._work, args=(self._queue, ),
+                name='slow-query-log', daemon=True,
+            ).start()
+
+    def enqueue(self, entry):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            slow_queries_dropped.inc()
+
+    def _work(self, work_queue):
+        # Запросы самого журнала в журнал не попадают.
+        _local.active = True
+        while True:
+            alias, *entry = work_queue.get()
+            try:
+                store_slow_query(connections[alias], *entry)
+            except DatabaseError:
+                # Например, таблица журнала ещё не создана миграцией
+                # или соединение оборвалось: следующая запись откроет
+                # новое.
+                logger.exception('Медленный запрос не сохранён')
+                connections.close_all()
+            finally:
+                if work_queue.empty():
+                    # Медленные запросы редки: соединения потока
+                    # не держим (с пулом они возвращаются в него).
+                    connections.close_all()
+                work_queue.task_done()
+
+    def flush(self, timeout=None):
+        """Ждёт сохранения запросов, уже стоящих в очереди."""
+        if self._queue is None or self._pid != os.getpid():
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_slow_query_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = SlowQueryWriter(
+                    settings.API_SLOW_QUERIES.get('MAX_PENDING', 1000))
+    return _writer
+
+
+@atexit.register
+def flush_slow_query_writer():
+    if _writer is not None:
+        _writer.flush(timeout=5)
+
+
+def record_slow_query(connection, sql, params, many, duration):
+    request = current_request.get()
+    view = get_view_name(request) if request is not None else '-'
+    normalized = normalize_sql(sql)
+    slow_queries.inc(view)
+    logger.warning('Медленный запрос %.1f мс, %s, %s: %s',
+                   duration * 1000, view, connection.alias, normalized)
+    if not settings.API_SLOW_QUERIES['STORE']:
+        return
+    get_slow_query_writer().enqueue((
+        connection.alias, sql, params, many, normalized, duration, view,
+        timezone.now()))
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """execute_wrapper: замеряет запрос и записывает медленный."""
+    if getattr(_local, 'active', False):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+    config = settings.API_SLOW_QUERIES
+    if config['ENABLED'] and duration * 1000 >= config['THRESHOLD_MS']:
+        record_slow_query(context['connection'], sql, params, many, duration)
+    return result
+
+
+@receiver(connection_created)
+def install_slow_query_log(connection, **kwargs):
+    # Обёртка ставится один раз: список живёт в объекте соединения.
+    if log_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_queries)
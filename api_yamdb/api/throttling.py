@@ -0,0 +1,245 @@
+# api/throttling.py
+"""Ограничение частоты запросов алгоритмом token bucket.
+
+У каждого ключа (область + клиент) есть ведро на N жетонов, которое
+пополняется со скоростью N за период (формат ставки DRF: '5/min').
+Запрос забирает жетон; пустое ведро - ответ 429 с Retry-After.
+Проверка идёт в initial() до кода представления и не обращается к БД.
+
+Состояние вёдер общее для всех воркеров gunicorn. Хранилище задаётся
+настройкой API_THROTTLE:
+
+- SharedMemoryBucketStorage (по умолчанию) - файл в памяти (/dev/shm),
+  отображённый в процессы через mmap, обновление под fcntl.flock;
+- CacheBucketStorage - общий кэш Django (memcached и т.п.), обновление
+  под блокировкой через cache.add. С кэшем в памяти процесса
+  (LocMemCache) у каждого воркера были бы свои вёдра и лимит вырос бы
+  в число воркеров, поэтому такая настройка - ошибка конфигурации.
+
+Адрес клиента берётся из X-Forwarded-For с учётом
+REST_FRAMEWORK['NUM_PROXIES']: nginx перезаписывает заголовок адресом
+клиента, а не дописывает к присланному.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework import permissions
+from rest_framework.throttling import BaseThrottle
+
+from .cache import is_shared_cache
+from .metrics import Counter
+
+throttle_requests = Counter(
+    'api_throttle_requests_total',
+    'Проверки ограничения частоты запросов.',
+    ('scope', 'result'),
+)
+
+BUCKET_KEY_PREFIX = 'api:throttle:'
+
+
+def parse_rate(rate):
+    """'5/min' -> (ёмкость ведра, жетонов в секунду)."""
+    number, period = rate.split('/')
+    seconds = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+    capacity = int(number)
+    return capacity, capacity / seconds
+
+
+def take_token(state, capacity, refill_rate, now):
+    """Новое состояние ведра и время ожидания (0 - жетон выдан)."""
+    if state is None:
+        tokens, updated_at = float(capacity), now
+    else:
+        tokens, updated_at = state
+        tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / refill_rate
+
+
+class CacheBucketStorage:
+    """Вёдра в кэше Django, общем для воркеров."""
+
+    LOCK_TIMEOUT = 1
+    LOCK_ATTEMPTS = 50
+
+    def __init__(self, options):
+        alias = options.get('CACHE_ALIAS', 'default')
+        if not is_shared_cache(alias):
+            raise ImproperlyConfigured(
+                f'CacheBucketStorage: кэш {alias!r} не общий для процессов, '
+                f'лимиты действовали бы в каждом воркере отдельно')
+        self.cache = caches[alias]
+
+    def consume(self, key, capacity, refill_rate):
+        bucket_key = BUCKET_KEY_PREFIX + key
+        lock_key = bucket_key + ':lock'
+        for _ in range(self.LOCK_ATTEMPTS):
+            if self.cache.add(lock_key, 1, self.LOCK_TIMEOUT):
+                break
+            time.sleep(0.001)
+        else:
+            # Блокировку держит зависший процесс: лучше пропустить
+            # запрос, чем отказать всем клиентам с этим ключом.
+            return 0
+        try:
+            state, wait = take_token(self.cache.get(bucket_key), capacity,
+                                     refill_rate, time.time())
+            # Полное ведро восстанавливается за capacity / refill_rate.
+            self.cache.set(bucket_key, state,
+                           int(capacity / refill_rate) + 1)
+        finally:
+            self.cache.delete(lock_key)
+        return wait
+
+
+class SharedMemoryBucketStorage:
+    """Вёдра в файле, отображённом в память всех воркеров.
+
+    Файл разбит на SLOTS ячеек по 16 байт (жетоны, время), ключ
+    попадает в ячейку по хэшу. Ключи с одной ячейкой делят ведро:
+    при редких коллизиях лимит становится строже, но не слабее.
+    """
+
+    SLOT = struct.Struct('dd')
+
+    def __init__(self, options):
+        self.slots = options.get('SLOTS', 65536)
+        directory = '/dev/shm' if os.path.isdir('/dev/shm') else (
+            tempfile.gettempdir())
+        self.path = options.get('PATH') or os.path.join(
+            directory, 'api_yamdb_throttle')
+        self._lock = threading.Lock()
+        self._pid = None
+        self._file = None
+        self._map = None
+
+    def _open(self):
+        # Каждый процесс открывает файл сам: flock действует на открытый
+        # файл, и унаследованный при fork дескриптор не разделял бы
+        # процессы между собой.
+        self._pid = os.getpid()
+        size = self.slots * self.SLOT.size
+        descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._file = os.fdopen(descriptor, 'r+b')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            if os.fstat(descriptor).st_size < size:
+                self._file.truncate(size)
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._map = mmap.mmap(descriptor, size)
+
+    def consume(self, key, capacity, refill_rate):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+        offset = int.from_bytes(digest, 'big') % self.slots * self.SLOT.size
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                tokens, updated_at = self.SLOT.unpack_from(self._map, offset)
+                # Нулевое время - ячейка ещё не использовалась.
+                state = (tokens, updated_at) if updated_at else None
+                state, wait = take_token(state, capacity, refill_rate,
+                                         time.time())
+                self.SLOT.pack_into(self._map, offset, *state)
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+        return wait
+
+
+_storage = None
+
+
+def get_bucket_storage():
+    global _storage
+    if _storage is None:
+        config = settings.API_THROTTLE
+        backend = import_string(config['STORAGE'])
+        _storage = backend(config.get('OPTIONS', {}))
+    return _storage
+
+
+@receiver(setting_changed)
+def reset_bucket_storage(setting, **kwargs):
+    global _storage
+    if setting in ('API_THROTTLE', 'CACHES'):
+        _storage = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Token bucket для области scope, ставка из API_THROTTLE['RATES']."""
+    scope = None
+
+    def get_client_key(self, request, view):
+        """Чей лимит расходует запрос: по умолчанию адрес клиента."""
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        rate = settings.API_THROTTLE['RATES'].get(self.scope)
+        if rate is None:
+            return True
+        client_key = self.get_client_key(request, view)
+        if client_key is None:
+            return True
+        capacity, refill_rate = parse_rate(rate)
+        self.wait_seconds = get_bucket_storage().consume(
+            f'{self.scope}:{client_key}', capacity, refill_rate)
+        allowed = not self.wait_seconds
+        throttle_requests.inc(self.scope, 'allowed' if allowed else 'denied')
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class SignupThrottle(TokenBucketThrottle):
+    scope = 'signup'
+
+
+class TokenObtainThrottle(TokenBucketThrottle):
+    """Попытки получить токен с одного адреса для одного имени.
+
+    Только по имени ключ брать нельзя: тогда любой мог бы исчерпать
+    лимит чужого пользователя и не дать ему получить токен.
+    """
+    scope = 'token'
+
+    def get_client_key(self, request, view):
+        data = request.data
+        username = data.get('username') if hasattr(data, 'get') else None
+        if not isinstance(username, str) or not username:
+            username = ''
+        digest = hashlib.sha1(username.encode('utf-8')).hexdigest()
+        return f'{self.get_ident(request)}:{digest}'
+
+
+class TokenObtainAddressThrottle(TokenBucketThrottle):
+    """Все попытки получить токен с одного адреса, по любым именам."""
+    scope = 'token_address'
+
+
+class WriteThrottle(TokenBucketThrottle):
+    """Ограничивает только изменяющие запросы, по автору."""
+    scope = 'writes'
+
+    def get_client_key(self, request, view):
+        if request.method in permissions.SAFE_METHODS:
+            return None
+        if request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return self.get_ident(request)
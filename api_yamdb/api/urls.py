@@ -5,6 +5,9 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     registerate,
     get_token,
+    export,
+    profiles,
+    profile_download,
     UserViewSet,
     TitleViewSet,
     GenreViewSet,
@@ -33,5 +36,9 @@ v1_router.register(
 urlpatterns = [
     path('v1/auth/signup/', registerate, name='signup'),
     path('v1/auth/token/', get_token, name='token'),
+    path('v1/export/<str:resource>/', export, name='export'),
+    path('v1/profiles/', profiles, name='profiles'),
+    path('v1/profiles/<str:name>/', profile_download,
+         name='profile-download'),
     path('v1/', include(v1_router.urls)),
 ]
@@ -1,7 +1,11 @@
+from django.db.models import Count
 from django_filters.rest_framework import FilterSet, CharFilter
 from rest_framework import mixins, viewsets, filters
+from rest_framework.exceptions import ValidationError
 
-from reviews.models import Title
+from reviews.models import GenreTitle, Title
+from reviews.search import search_titles
+from .cache import CachedResponseMixin
 from .permissions import IsAuthorCanUpdateOrReadOnly
 
 
@@ -9,6 +13,7 @@ class FilterTitle(FilterSet):
     genre = CharFilter(field_name='genre__slug', lookup_expr='iexact')
     category = CharFilter(field_name='category__slug', lookup_expr='iexact')
     name = CharFilter(field_name='name', lookup_expr='icontains')
+    search = CharFilter(method='filter_search')
 
     class Meta:
         model = Title
@@ -19,9 +24,58 @@ class FilterTitle(FilterSet):
             'year',
         )
 
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию и описанию с ранжированием."""
+        return search_titles(queryset, value)
 
-class MixinBasicSet(mixins.CreateModelMixin, mixins.ListModelMixin,
-                    mixins.DestroyModelMixin, viewsets.GenericViewSet):
+
+def filter_titles(queryset, params, exclude=None):
+    """Применяет FilterTitle ко всем параметрам, кроме exclude."""
+    params = params.copy()
+    params.pop(exclude, None)
+    filterset = FilterTitle(data=params, queryset=queryset)
+    if not filterset.is_valid():
+        raise ValidationError(filterset.errors)
+    # Подзапрос по pk отбрасывает аннотации поиска и дубли от JOIN жанров.
+    return Title.objects.filter(
+        pk__in=filterset.qs.order_by().values('pk'))
+
+
+def count_title_facets(params):
+    """Количество произведений по жанрам, категориям и годам.
+
+    Для каждого фасета применяются все фильтры, кроме его собственного:
+    так видно, сколько произведений даст выбор другого значения.
+    """
+    queryset = Title.objects.all()
+    genres = GenreTitle.objects.filter(
+        title__in=filter_titles(queryset, params, 'genre').values('pk'),
+    ).values('genre__slug', 'genre__name').annotate(
+        count=Count('title', distinct=True)).order_by('genre__slug')
+    categories = filter_titles(queryset, params, 'category').values(
+        'category__slug', 'category__name').annotate(
+        count=Count('id')).order_by('category__slug')
+    years = filter_titles(queryset, params, 'year').values(
+        'year').annotate(count=Count('id')).order_by('year')
+    return {
+        'count': filter_titles(queryset, params).count(),
+        'genre': [
+            {'slug': row['genre__slug'], 'name': row['genre__name'],
+             'count': row['count']}
+            for row in genres
+        ],
+        'category': [
+            {'slug': row['category__slug'], 'name': row['category__name'],
+             'count': row['count']}
+            for row in categories
+        ],
+        'year': list(years),
+    }
+
+
+class MixinBasicSet(CachedResponseMixin, mixins.CreateModelMixin,
+                    mixins.ListModelMixin, mixins.DestroyModelMixin,
+                    viewsets.GenericViewSet):
     permission_classes = (IsAuthorCanUpdateOrReadOnly, )
     filter_backends = (filters.SearchFilter, )
     search_fields = ('name', )
@@ -1,17 +1,22 @@
 # api/views.py
-from django.db.models import Avg
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils.crypto import get_random_string
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.utils.functional import cached_property
 from rest_framework.response import Response
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import (action, api_view,
+                                       authentication_classes,
+                                       permission_classes, throttle_classes)
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.pagination import LimitOffsetPagination
 from django_filters.rest_framework import DjangoFilterBackend
-from django.core.mail import send_mail
 # from rest_framework.pagination import LimitOffsetPagination
 
-from reviews.models import User, Title, Genre, Category, Review
+from reviews.csv_tools import EXPORT_FORMATS, export_lines
+from reviews.models import User, Title, Genre, Category, Review, Comment
 from api_yamdb.settings import (DEFAULT_CHAR_FIELD_LENGTH, ADMIN_EMAIL)
 from .serializers import (UserSerializer, UserEditSerializer,
                           UserRegisterationSerializer, UserTokenSerializer,
@@ -20,41 +25,48 @@ from .serializers import (UserSerializer, UserEditSerializer,
                           CommentSerializer, ReviewSerializer)
 from .permissions import (IsAuthenticatedAndAdmin, IsAuthorCanUpdateOrReadOnly,
                           ReadIfNotAdmin)
-from .utils import FilterTitle, MixinBasicSet
+from .authentication import authentication_profile, tokens_for_user
+from .cache import CachedResponseMixin, title_resource
+from .mail import queue_mail
+from .conditional import ConditionalGetMixin
+from .utils import FilterTitle, MixinBasicSet, count_title_facets
+from .pagination import (LimitOffsetOrCursorPagination,
+                         PageNumberOrCursorPagination)
+from .profiling import list_profiles, make_profile_token, profile_path
+from .replicas import ReplicaReadMixin
+from .throttling import (SignupThrottle, TokenObtainAddressThrottle,
+                         TokenObtainThrottle, WriteThrottle)
 
 
 def create_and_send_registration_email(email_to, confirmation_code):
-    email_subject = 'Регистрация'
-    email_message = f'Код подтверждения: {confirmation_code}'
-    email_recipient_list = [email_to]
-    send_mail(
-        subject=email_subject,
-        message=email_message,
+    """Ставит письмо с кодом подтверждения в очередь отправки."""
+    queue_mail(
+        subject='Регистрация',
+        body=f'Код подтверждения: {confirmation_code}',
         from_email=ADMIN_EMAIL,
-        recipient_list=email_recipient_list,
+        recipient_list=[email_to],
     )
 
 
 @api_view(['POST'])
+@authentication_classes(authentication_profile('public'))
 @permission_classes([permissions.AllowAny])
+@throttle_classes([SignupThrottle])
 def registerate(request):
     """Регистрирует нового пользователя."""
     serializer = UserRegisterationSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    user_name = serializer.validated_data['username']
-    user_email = serializer.validated_data['email']
-    serializer.save()
     confirmation_code = get_random_string(length=DEFAULT_CHAR_FIELD_LENGTH)
-    User.objects.filter(
-        username=user_name,
-        email=user_email).update(confirmation_code=confirmation_code)
-    create_and_send_registration_email(email_to=user_email,
+    user = serializer.save(confirmation_code=confirmation_code)
+    create_and_send_registration_email(email_to=user.email,
                                        confirmation_code=confirmation_code)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
+@authentication_classes(authentication_profile('public'))
 @permission_classes([permissions.AllowAny])
+@throttle_classes([TokenObtainThrottle, TokenObtainAddressThrottle])
 def get_token(request):
     """Получение токена в обмен  confirmation code."""
     serializer = UserTokenSerializer(data=request.data)
@@ -68,12 +80,72 @@ def get_token(request):
         user_obj.save()
         message = {'confirmation_code': 'Неверный код'}
         return Response(message, status=status.HTTP_400_BAD_REQUEST)
-    refresh = RefreshToken.for_user(user_obj)
-    message = {'token': str(refresh.access_token)}
+    _, access = tokens_for_user(user_obj)
+    message = {'token': str(access)}
     return Response(message, status=status.HTTP_200_OK)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+EXPORT_MODELS = {'titles': Title, 'reviews': Review, 'comments': Comment}
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+@api_view(['GET'])
+@authentication_classes(authentication_profile('scripts'))
+@permission_classes([IsAuthenticatedAndAdmin])
+def export(request, resource):
+    """Потоковая выгрузка таблицы в формате loadcsv (?output=csv|ndjson)."""
+    model = EXPORT_MODELS.get(resource)
+    if model is None:
+        raise Http404
+    output = request.query_params.get('output', 'csv')
+    if output not in EXPORT_FORMATS:
+        formats = ', '.join(EXPORT_FORMATS)
+        message = {'output': f'Допустимые форматы: {formats}'}
+        return Response(message, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(
+        export_lines(model.objects.all(), output=output),
+        content_type=EXPORT_CONTENT_TYPES[output],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{resource}.{output}"')
+    return response
+
+
+@api_view(['GET', 'POST'])
+@authentication_classes(authentication_profile('scripts'))
+@permission_classes([IsAuthenticatedAndAdmin])
+def profiles(request):
+    """Список профилей запросов; POST выдаёт заголовок для профилирования
+    одного запроса."""
+    if request.method == 'POST':
+        return Response({
+            'header': settings.API_PROFILING['HEADER'],
+            'value': make_profile_token(request.user),
+            'max_age': settings.API_PROFILING['TOKEN_MAX_AGE'],
+        }, status=status.HTTP_201_CREATED)
+    return Response([
+        {'name': name, 'size': size,
+         'created': datetime.fromtimestamp(mtime, timezone.utc)}
+        for name, size, mtime in list_profiles()
+    ])
+
+
+@api_view(['GET'])
+@authentication_classes(authentication_profile('scripts'))
+@permission_classes([IsAuthenticatedAndAdmin])
+def profile_download(request, name):
+    """Скачивание профиля в формате pstats."""
+    path = profile_path(name)
+    if path is None:
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name,
+                        content_type='application/octet-stream')
+
+
+class UserViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """Класс для работы с пользователями."""
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -94,8 +166,9 @@ class UserViewSet(viewsets.ModelViewSet):
     def me(self, request):
         user_obj = get_object_or_404(User, id=request.user.id)
         if request.method == 'GET':
-            return Response(UserSerializer(user_obj).data,
-                            status=status.HTTP_200_OK)
+            serializer = UserSerializer(
+                user_obj, context=self.get_serializer_context())
+            return Response(serializer.data, status=status.HTTP_200_OK)
 
         serializer = UserEditSerializer(
             instance=user_obj,
@@ -107,57 +180,124 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.annotate(rating=Avg('reviews__score'))
+class TitleViewSet(ReplicaReadMixin, ConditionalGetMixin,
+                   CachedResponseMixin, viewsets.ModelViewSet):
+    queryset = Title.objects.select_related(
+        'category').prefetch_related('genre')
     permission_classes = (ReadIfNotAdmin, )
     filter_backends = (DjangoFilterBackend, )
     filterset_class = FilterTitle
-    pagination_class = LimitOffsetPagination
+    pagination_class = LimitOffsetOrCursorPagination
+    cache_resources = ('titles', 'genres', 'categories', 'reviews')
+    conditional_actions = ('retrieve', )
+
+    def get_last_modified(self):
+        return Title.objects.filter(pk=self.kwargs.get('pk')).values_list(
+            'modified', flat=True).first()
 
     def get_serializer_class(self):
         if self.request.method in permissions.SAFE_METHODS:
             return TitleReadSerializer
         return TitleUpdateSerializer
 
+    def is_response_cacheable(self, request):
+        # Фасеты не зависят от пользователя и кэшируются для всех.
+        if self.action == 'facets':
+            return True
+        return super().is_response_cacheable(request)
 
-class CategoryViewSet(MixinBasicSet):
+    def retrieve(self, request, *args, **kwargs):
+        # Отзыв к другому произведению этот ответ не сбрасывает.
+        return self.cached_response(
+            super().retrieve, request, *args,
+            resources=('titles', 'genres', 'categories',
+                       title_resource(kwargs.get('pk'))),
+            **kwargs)
+
+    @action(detail=False, methods=['GET'])
+    def facets(self, request):
+        """Счётчики произведений по жанрам, категориям и годам."""
+        return self.cached_response(
+            self.count_facets, request,
+            resources=('titles', 'genres', 'categories'),
+        )
+
+    def count_facets(self, request):
+        return Response(count_title_facets(request.query_params))
+
+
+class CategoryViewSet(ReplicaReadMixin, MixinBasicSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = (ReadIfNotAdmin, )
+    cache_resources = ('categories', )
 
 
-class GenreViewSet(MixinBasicSet):
+class GenreViewSet(ReplicaReadMixin, MixinBasicSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = (ReadIfNotAdmin, )
+    cache_resources = ('genres', )
+
 
+class ReviewViewSet(ReplicaReadMixin, ConditionalGetMixin,
+                    viewsets.ModelViewSet):
+    """Отзывы произведения.
 
-class ReviewViewSet(viewsets.ModelViewSet):
+    Произведение читается не больше одного раза за запрос (self.title),
+    список и детальный отзыв выбираются по title_id без него.
+    """
     serializer_class = ReviewSerializer
     permission_classes = (IsAuthorCanUpdateOrReadOnly, )
-    pagination_class = LimitOffsetPagination
+    throttle_classes = (WriteThrottle, )
+    pagination_class = LimitOffsetOrCursorPagination
+
+    @cached_property
+    def title(self):
+        return get_object_or_404(Title.objects.only('id', 'modified'),
+                                 id=self.kwargs.get('title_id'))
+
+    def get_last_modified(self):
+        return self.title.modified
 
     def get_queryset(self):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        return title.reviews.all()
+        # Для GET существование произведения уже проверил
+        # get_last_modified; для остальных запросов отсутствие
+        # произведения и отзыва одинаково даёт 404.
+        return Review.objects.filter(
+            title_id=self.kwargs.get('title_id')).select_related('author')
 
     def perform_create(self, serializer):
-        title = get_object_or_404(Title, id=self.kwargs.get('title_id'))
-        serializer.save(author=self.request.user, title=title)
+        serializer.save(author=self.request.user, title=self.title)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ReplicaReadMixin, ConditionalGetMixin,
+                     viewsets.ModelViewSet):
+    """Комментарии к отзыву; отзыв читается не больше одного раза."""
     serializer_class = CommentSerializer
     permission_classes = (IsAuthorCanUpdateOrReadOnly, )
+    throttle_classes = (WriteThrottle, )
+    pagination_class = PageNumberOrCursorPagination
+
+    @cached_property
+    def review(self):
+        return get_object_or_404(
+            Review.objects.only('id', 'title_id'),
+            id=self.kwargs.get('review_id'),
+            title=self.kwargs.get('title_id'),
+        )
+
+    def get_last_modified(self):
+        return Title.objects.filter(
+            pk=self.kwargs.get('title_id'),
+            reviews=self.kwargs.get('review_id'),
+        ).values_list('modified', flat=True).first()
 
     def get_queryset(self):
-        review_id = self.kwargs.get('review_id')
-        title_id = self.kwargs.get('title_id')
-        review = get_object_or_404(Review, id=review_id, title=title_id)
-        return review.comments.all()
+        return Comment.objects.filter(
+            review_id=self.kwargs.get('review_id'),
+            review__title_id=self.kwargs.get('title_id'),
+        ).select_related('author')
 
     def perform_create(self, serializer):
-        review_id = self.kwargs.get('review_id')
-        title_id = self.kwargs.get('title_id')
-        review = get_object_or_404(Review, id=review_id, title=title_id)
-        serializer.save(author=self.request.user, review=review)
+        serializer.save(author=self.request.user, review=self.review)
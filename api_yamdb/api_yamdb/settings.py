@@ -1,3 +1,4 @@
+import importlib.util
 import os
 from datetime import timedelta
 
@@ -33,16 +34,53 @@ INSTALLED_APPS = [
     'reviews.apps.ReviewsConfig',
 ]
 
+# Сессии, CSRF, сообщения и X-Frame-Options не работают на путях
+# из API_MIDDLEWARE_SKIP_PREFIXES (api/middleware.py).
 MIDDLEWARE = [
+    'api.middleware.RequestTimingMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'api.middleware.ApiSkippingSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ApiSkippingCsrfViewMiddleware',
+    'api.middleware.ApiSkippingAuthenticationMiddleware',
+    'api.middleware.ApiSkippingMessageMiddleware',
+    'api.middleware.ApiSkippingXFrameOptionsMiddleware',
 ]
 
+API_MIDDLEWARE_SKIP_PREFIXES = ('/api/', '/metrics')
+
+# Заголовок Server-Timing с замерами запроса (api/middleware.py),
+# только для администраторов. Гистограммы /metrics собираются всегда.
+API_SERVER_TIMING = os.getenv('API_SERVER_TIMING', default='0') == '1'
+
+# Профилирование запросов (api/profiling.py): доля SAMPLE_RATE запросов
+# или запросы с подписанным заголовком HEADER от /api/v1/profiles/.
+# Заголовок действует TOKEN_MAX_AGE секунд на один запрос: использованные
+# отмечаются в общем кэше CACHE_ALIAS.
+API_PROFILING = {
+    'SAMPLE_RATE': float(os.getenv('API_PROFILING_SAMPLE_RATE', default=0)),
+    'HEADER': 'X-Profile',
+    'TOKEN_MAX_AGE': 60,
+    'CACHE_ALIAS': 'default',
+    'DIRECTORY': os.getenv('API_PROFILING_DIRECTORY',
+                           default=os.path.join(BASE_DIR, 'profiles')),
+    'MAX_FILES': int(os.getenv('API_PROFILING_MAX_FILES', default=50)),
+}
+
+# Журнал медленных запросов к БД (api/slow_queries.py): запросы дольше
+# THRESHOLD_MS пишутся в лог и в таблицу SlowQuery (админка), для нового
+# отпечатка запроса сохраняется план EXPLAIN. Пишет их фоновый поток,
+# в очереди к нему не больше MAX_PENDING запросов.
+API_SLOW_QUERIES = {
+    'ENABLED': os.getenv('API_SLOW_QUERIES', default='1') == '1',
+    'THRESHOLD_MS': float(
+        os.getenv('API_SLOW_QUERIES_THRESHOLD_MS', default=200)),
+    'EXPLAIN': os.getenv('API_SLOW_QUERIES_EXPLAIN', default='1') == '1',
+    'STORE': True,
+    'MAX_PENDING': 1000,
+}
+
 ROOT_URLCONF = 'api_yamdb.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
@@ -74,17 +112,100 @@ WSGI_APPLICATION = 'api_yamdb.wsgi.application'
 #     }
 # }
 
+DB_ENGINE = os.getenv('DB_ENGINE', default='django.db.backends.postgresql')
+DB_POOL_ENGINE = 'api.backends.postgresql_pool'
+
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
+        'ENGINE': DB_ENGINE,
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        # Соединение переживает запросы CONN_MAX_AGE секунд и проверяется
+        # перед запросом, если простояло дольше CONN_HEALTH_CHECK_IDLE
+        # секунд (api/database.py). С движком
+        # api.backends.postgresql_pool всегда 0: соединение возвращается
+        # в пул процесса в конце запроса.
+        'CONN_MAX_AGE': int(os.getenv(
+            'DB_CONN_MAX_AGE',
+            default=0 if DB_ENGINE == DB_POOL_ENGINE else 60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='1') == '1',
+        'CONN_HEALTH_CHECK_IDLE': 5,
+        'POOL': {
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', default=5)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', default=5)),
+            'MAX_LIFETIME': 1800,
+            'HEALTH_CHECK_IDLE': 5,
+        },
     }
 }
 
+# Реплики для чтения (api/replicas.py): DB_REPLICA_HOSTS=replica1,host2:5433.
+# Безопасные запросы к API читают с реплик, автор изменения
+# STICKY_SECONDS секунд читает из основной БД. Отметка об этом хранится
+# в кэше CACHE_ALIAS, он должен быть общим для процессов (memcached).
+for number, address in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', default='').split(',')),
+        start=1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'], HOST=host,
+        PORT=port or DATABASES['default']['PORT'],
+        TEST={'MIRROR': 'default'})
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+
+API_REPLICAS = {
+    'ALIASES': tuple(alias for alias in DATABASES if alias != 'default'),
+    'STICKY_SECONDS': int(os.getenv('DB_REPLICA_STICKY_SECONDS', default=10)),
+    'CACHE_ALIAS': 'default',
+}
+
+
+# Cache
+
+# Кэш по умолчанию общий для воркеров gunicorn: в docker-compose это
+# memcached. LocMemCache (без CACHE_BACKEND) живёт в памяти одного
+# процесса и годится только для разработки: на нём кэш ответов API
+# выключается, а роль JWT-пользователя читается из БД (API_PRINCIPAL).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+# Кэш ответов API для анонимных GET-запросов (api/cache.py).
+# BACKEND: api.cache.LRUResponseCache - LRU в памяти процесса,
+# api.cache.SharedResponseCache - кэш Django с алиасом CACHE_ALIAS,
+# api.cache.DummyResponseCache - кэш выключен. Версии ответов хранятся
+# в VERSIONS_CACHE; если он не общий для процессов, кэш ответов выключен.
+API_RESPONSE_CACHE = {
+    'BACKEND': os.getenv('API_CACHE_BACKEND',
+                         default='api.cache.LRUResponseCache'),
+    'OPTIONS': {
+        'MAX_ENTRIES': int(os.getenv('API_CACHE_MAX_ENTRIES', default=1024)),
+        'TIMEOUT': int(os.getenv('API_CACHE_TIMEOUT', default=60)),
+        'CACHE_ALIAS': 'default',
+    },
+    'VERSIONS_CACHE': 'default',
+}
+
+# Cache-Control анонимных GET-ответов, которые кэширует API_RESPONSE_CACHE:
+# nginx (infra/nginx/default.conf) держит их S_MAXAGE секунд и ещё
+# STALE_WHILE_REVALIDATE секунд отдаёт прежний ответ, обновляя его в фоне.
+# S_MAXAGE=0 выключает кэширование в nginx.
+API_EDGE_CACHE = {
+    'S_MAXAGE': int(os.getenv('API_EDGE_CACHE_S_MAXAGE', default=5)),
+    'STALE_WHILE_REVALIDATE': int(
+        os.getenv('API_EDGE_CACHE_STALE_WHILE_REVALIDATE', default=30)),
+}
+
 
 # Password validation
 
@@ -128,19 +249,68 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 AUTH_USER_MODEL = 'reviews.User'
 
+# Профили аутентификации групп эндпоинтов (api/authentication.py).
+# api - весь /api/v1/: только JWT, без сессий и CSRF;
+# public - регистрация и получение токена: аутентификация не нужна;
+# scripts - выгрузки: JWT или Basic с кэшем проверенных паролей.
+API_AUTHENTICATION_PROFILES = {
+    'api': [
+        'api.authentication.CachedJWTAuthentication',
+    ],
+    'public': [],
+    'scripts': [
+        'api.authentication.CachedJWTAuthentication',
+        'api.authentication.CachedBasicAuthentication',
+    ],
+}
+
+# Кэш проверенных Basic-паролей: повторный запрос не считает PBKDF2.
+API_BASIC_AUTH_CACHE = {
+    'TIMEOUT': 60,
+    'MAX_ENTRIES': 1024,
+}
+
+# Ограничение частоты запросов (api/throttling.py). Вёдра общие для
+# воркеров: STORAGE api.throttling.SharedMemoryBucketStorage - в файле
+# в /dev/shm, api.throttling.CacheBucketStorage - в кэше Django CACHE_ALIAS
+# (только общем для процессов, например memcached).
+API_THROTTLE = {
+    'STORAGE': os.getenv('API_THROTTLE_STORAGE',
+                         default='api.throttling.SharedMemoryBucketStorage'),
+    'OPTIONS': {
+        'CACHE_ALIAS': 'default',
+    },
+    'RATES': {
+        'signup': os.getenv('API_THROTTLE_SIGNUP', default='5/min'),
+        'token': os.getenv('API_THROTTLE_TOKEN', default='10/min'),
+        'token_address': os.getenv('API_THROTTLE_TOKEN_ADDRESS',
+                                   default='30/min'),
+        'writes': os.getenv('API_THROTTLE_WRITES', default='30/min'),
+    },
+}
+
+# Рендереры ответов API (api/renderers.py): JSON через orjson, если он
+# установлен; MessagePack (Accept: application/msgpack) - при установленном
+# пакете msgpack.
+API_RENDERER_CLASSES = [
+    'api.renderers.FastJSONRenderer',
+    'rest_framework.renderers.BrowsableAPIRenderer',
+]
+if importlib.util.find_spec('msgpack') is not None:
+    API_RENDERER_CLASSES.append('api.renderers.MessagePackRenderer')
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
-    ],
+    'DEFAULT_AUTHENTICATION_CLASSES': API_AUTHENTICATION_PROFILES['api'],
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': API_RENDERER_CLASSES,
+    # Перед gunicorn один nginx: адрес клиента - последний
+    # в X-Forwarded-For (infra/nginx/default.conf).
+    'NUM_PROXIES': 1,
 }
 
 SIMPLE_JWT = {
@@ -148,12 +318,38 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Откуда JWT-аутентификация берёт роль пользователя (api/authentication.py).
+# MODE: claims - из токена, cache - из кэша процесса на TIMEOUT секунд,
+# database - из БД на каждый запрос. claims и cache работают, только если
+# кэш версий (API_RESPONSE_CACHE['VERSIONS_CACHE']) общий для процессов.
+API_PRINCIPAL = {
+    'MODE': os.getenv('API_PRINCIPAL_MODE', default='cache'),
+    'TIMEOUT': int(os.getenv('API_PRINCIPAL_TIMEOUT', default=300)),
+    'MAX_ENTRIES': 10000,
+}
+
 # Email consts
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 ADMIN_EMAIL = 'admin@yamdb.com'
 
+# Очередь исходящих писем (api/mail.py).
+# BACKEND: api.mail.ThreadedMailQueue - фоновые потоки в каждом процессе,
+# api.mail.ImmediateMailQueue - отправка прямо в запросе.
+API_MAIL_QUEUE = {
+    'BACKEND': os.getenv('API_MAIL_QUEUE_BACKEND',
+                         default='api.mail.ThreadedMailQueue'),
+    'OPTIONS': {
+        'WORKERS': int(os.getenv('API_MAIL_QUEUE_WORKERS', default=2)),
+        'BATCH_SIZE': 50,
+        'MAX_SIZE': 10000,
+        'MAX_RETRIES': 5,
+        'RETRY_BACKOFF': 1.0,
+    },
+    'SHUTDOWN_TIMEOUT': 10,
+}
+
 
 DEFAULT_CHAR_FIELD_LENGTH = 150
 DEFAULT_EMAIL_FIELD_LENGTH = 254
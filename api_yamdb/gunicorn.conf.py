@@ -0,0 +1,166 @@
+# gunicorn.conf.py
+"""Настройки gunicorn, подбираемые по доступным ядрам.
+
+Режим воркеров задаёт GUNICORN_WORKER_CLASS:
+
+- gthread (по умолчанию) - процессы с пулом потоков: медленный запрос
+  занимает поток, а не весь процесс;
+- sync - один запрос на процесс, процессов 2 * ядра + 1;
+- gevent - цикл событий на процесс, тысячи одновременных соединений;
+  psycogreen делает psycopg2 неблокирующим (оба пакета
+  в requirements.txt).
+
+Число ядер берётся с учётом квоты CPU контейнера (cgroup). Любое
+значение можно задать явно: GUNICORN_WORKERS, GUNICORN_THREADS,
+GUNICORN_WORKER_CONNECTIONS. В режиме gevent без пула соединений
+GUNICORN_WORKER_CONNECTIONS урезается так, чтобы все воркеры вместе
+не открыли больше DB_MAX_CONNECTIONS подключений к PostgreSQL.
+Сравнить режимы под нагрузкой: python manage.py loadtest.
+"""
+import gc
+import math
+import os
+
+
+def env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def cgroup_cpu_limit():
+    """Квота CPU контейнера в ядрах или None без ограничения."""
+    try:
+        # cgroup v2: "<квота> <период>" или "max <период>".
+        with open('/sys/fs/cgroup/cpu.max') as cpu_max:
+            quota, period = cpu_max.read().split()
+        if quota == 'max':
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as quota_file:
+            quota = int(quota_file.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as period_file:
+            period = int(period_file.read())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 else None
+
+
+def available_cores():
+    cores = len(os.sched_getaffinity(0)) if hasattr(
+        os, 'sched_getaffinity') else os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cores = min(cores, max(1, math.ceil(limit)))
+    return cores
+
+
+cores = available_cores()
+max_workers = env_int('GUNICORN_MAX_WORKERS', 12)
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'sync':
+    workers = min(2 * cores + 1, max_workers)
+    threads = 1
+elif worker_class == 'gthread':
+    # Потоки ждут БД и сеть без GIL; процессов меньше, чем в sync,
+    # памяти и соединений с БД тоже.
+    workers = min(cores + 1, max_workers)
+    threads = 4
+else:
+    workers = min(cores, max_workers)
+    threads = 1
+
+workers = env_int('GUNICORN_WORKERS', workers)
+threads = env_int('GUNICORN_THREADS', threads)
+
+# Подключений к PostgreSQL, доступных всем воркерам вместе: меньше
+# max_connections сервера (100 по умолчанию) с запасом для миграций,
+# cron и администраторов.
+db_max_connections = env_int('DB_MAX_CONNECTIONS', 90)
+db_pool = os.getenv('DB_ENGINE') == 'api.backends.postgresql_pool'
+if worker_class == 'gevent':
+    worker_connections = env_int('GUNICORN_WORKER_CONNECTIONS', 100)
+    if not db_pool:
+        # Без пула каждый greenlet держит своё подключение к БД.
+        # С пулом подключений DB_POOL_MAX_SIZE на воркер, остальные
+        # greenlet'ы ждут свободное.
+        worker_connections = min(
+            worker_connections, max(db_max_connections // workers, 1))
+
+
+# Код Django и проекта импортируется один раз в мастере, воркеры
+# получают его через fork и делят страницы памяти copy-on-write.
+# Кроме gevent: воркер патчит модули после fork, и блокировки,
+# созданные при импорте в мастере, остались бы непропатченными.
+preload_app = os.getenv(
+    'GUNICORN_PRELOAD', '0' if worker_class == 'gevent' else '1') == '1'
+
+# Перезапуск воркера после N запросов ограничивает рост памяти;
+# разброс не даёт всем воркерам перезапуститься одновременно.
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int(
+    'GUNICORN_MAX_REQUESTS_JITTER', max(max_requests // 10, 1))
+
+timeout = env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+# Дольше keepalive_timeout у nginx (60 с): соединение закрывает nginx,
+# и запрос не уходит в уже закрытое gunicorn соединение.
+keepalive = env_int('GUNICORN_KEEPALIVE', 65)
+# Файлы пульса воркеров в памяти, а не на overlayfs контейнера.
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG') or None
+errorlog = '-'
+
+
+def db_connections():
+    """Сколько подключений к БД могут открыть все воркеры."""
+    if db_pool:
+        per_worker = env_int('DB_POOL_MAX_SIZE', 5)
+    elif worker_class == 'gevent':
+        per_worker = worker_connections
+    else:
+        per_worker = threads
+    return workers * per_worker
+
+
+def on_starting(server):
+    if db_connections() > db_max_connections:
+        server.log.warning(
+            'Воркеры могут открыть %s подключений к БД, больше '
+            'DB_MAX_CONNECTIONS=%s: уменьшите GUNICORN_WORKERS или '
+            'DB_POOL_MAX_SIZE', db_connections(), db_max_connections)
+
+
+def pre_fork(server, worker):
+    if not preload_app:
+        return
+    # Соединения, открытые при импорте, не должны достаться воркерам:
+    # два процесса на одном сокете портят протокол БД. С пулом
+    # close_all возвращает соединение в пул мастера, поэтому пулы
+    # закрываются отдельно.
+    from django.db import connections
+
+    from api.database import close_pools
+    connections.close_all()
+    close_pools()
+    # Объекты мастера переносятся в постоянное поколение: сборщик
+    # мусора в воркере не трогает их и не копирует страницы памяти.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if worker_class != 'gevent':
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        server.log.warning('psycogreen не установлен: запросы к БД '
+                           'блокируют цикл событий gevent')
+    else:
+        patch_psycopg()
@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_indexes(sender, using, **kwargs):
+    from django.db import connections
+
+    from .search import create_search_indexes
+    create_search_indexes(connections[using])
 
 
 class ReviewsConfig(AppConfig):
     name = 'reviews'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(ensure_search_indexes, sender=self)
@@ -0,0 +1,202 @@
+# reviews/csv_tools.py
+"""Общий формат csv для загрузки и выгрузки данных моделей."""
+import csv
+import io
+import json
+import os
+from functools import lru_cache
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import AutoField
+
+# Заголовки csv, которые отличаются от attname поля модели.
+RENAME_CSV_FIELDS = {'category': 'category_id', 'author': 'author_id'}
+ATTNAME_TO_CSV = {value: key for key, value in RENAME_CSV_FIELDS.items()}
+# Производные поля произведения пересчитываются после загрузки.
+DERIVED_FIELDS = ('score_sum', 'review_count', 'modified')
+EXPORT_FORMATS = ('csv', 'ndjson')
+COPY_ESCAPES = str.maketrans(
+    {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def csv_to_attname(column):
+    return RENAME_CSV_FIELDS.get(column, column)
+
+
+def export_columns(model):
+    """Колонки выгрузки: [(заголовок csv, attname)] в формате loadcsv."""
+    return [
+        (ATTNAME_TO_CSV.get(field.attname, field.attname), field.attname)
+        for field in model._meta.concrete_fields
+        if field.attname not in DERIVED_FIELDS
+    ]
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу отдаёт записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(queryset, output='csv', chunk_size=2000):
+    """Строки выгрузки модели в csv или NDJSON.
+
+    iterator(chunk_size) читает таблицу серверным курсором (PostgreSQL)
+    порциями, поэтому память не зависит от размера таблицы.
+    """
+    columns = export_columns(queryset.model)
+    headers = [header for header, _ in columns]
+    rows = queryset.order_by('pk').values_list(
+        *(attname for _, attname in columns)
+    ).iterator(chunk_size=chunk_size)
+    if output == 'ndjson':
+        for row in rows:
+            yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder,
+                             ensure_ascii=False) + '\n'
+        return
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(
+            [value.isoformat() if hasattr(value, 'isoformat') else value
+             for value in row])
+
+
+@lru_cache(maxsize=None)
+def nullable_attnames(model):
+    return frozenset(field.attname for field in model._meta.concrete_fields
+                     if field.null)
+
+
+def row_to_kwargs(row, model):
+    """Строка csv -> именованные аргументы конструктора модели.
+
+    Пустое значение в поле с null=True читается как NULL, как и в COPY.
+    """
+    nullable = nullable_attnames(model)
+    kwargs = {}
+    for key, value in row.items():
+        attname = csv_to_attname(key)
+        kwargs[attname] = None if (
+            value == '' and attname in nullable) else value
+    return kwargs
+
+
+def csv_model_key(name):
+    """Имя файла или модели -> ключ сопоставления.
+
+    titles.csv, genre_title.csv и users.csv соответствуют моделям
+    Title, GenreTitle и User.
+    """
+    key = name.lower().replace('_', '')
+    return key[:-1] if key.endswith('s') else key
+
+
+def find_csv_files(directory, models):
+    """Сопоставляет csv-файлы каталога моделям: {модель: путь}."""
+    by_key = {csv_model_key(model.__name__): model for model in models}
+    found = {}
+    for filename in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(filename)
+        model = by_key.get(csv_model_key(stem))
+        if extension.lower() == '.csv' and model is not None:
+            found[model] = os.path.join(directory, filename)
+    return found
+
+
+def model_dependencies(models):
+    """Для каждой модели — модели из того же набора, на которые
+    она ссылается внешними ключами."""
+    dependencies = {}
+    for model in models:
+        dependencies[model] = {
+            field.related_model
+            for field in model._meta.concrete_fields
+            if field.many_to_one and field.related_model in models
+            and field.related_model is not model
+        }
+    return dependencies
+
+
+def load_levels(models):
+    """Делит модели на уровни: модели уровня зависят только от
+    предыдущих уровней и могут загружаться одновременно."""
+    pending = model_dependencies(set(models))
+    levels = []
+    while pending:
+        ready = [model for model, needs in pending.items() if not needs]
+        if not ready:
+            names = ', '.join(sorted(model.__name__ for model in pending))
+            raise ValueError(f'Циклическая зависимость моделей: {names}')
+        ready.sort(key=lambda model: model.__name__)
+        levels.append(ready)
+        for model in ready:
+            del pending[model]
+        for needs in pending.values():
+            needs.difference_update(ready)
+    return levels
+
+
+def copy_fields(model, header):
+    """Поля модели для COPY: колонки csv и все остальные, кроме id.
+
+    Незаданный автоинкрементный id заполняет последовательность,
+    остальные колонки без значения в csv получают значения по умолчанию.
+    """
+    attnames = {csv_to_attname(key) for key in header}
+    return [field for field in model._meta.concrete_fields
+            if field.attname in attnames or not isinstance(field, AutoField)]
+
+
+def copy_text(value):
+    """Значение в текстовом формате COPY: NULL - \\N, спецсимволы
+    экранируются обратной косой чертой."""
+    if value is None:
+        return '\\N'
+    return str(value).translate(COPY_ESCAPES)
+
+
+def copy_lines(model, rows, connection):
+    """Колонки и строки COPY для строк csv.
+
+    Строка проходит через модель, как при save(): поля, которых нет
+    в csv, получают default, auto_now - текущее время.
+    """
+    fields = copy_fields(model, rows[0])
+    lines = []
+    for row in rows:
+        instance = model(**row_to_kwargs(row, model))
+        lines.append('\t'.join(
+            copy_text(field.get_db_prep_save(
+                field.pre_save(instance, True), connection))
+            for field in fields) + '\n')
+    return [field.column for field in fields], lines
+
+
+def copy_rows(model, rows, using='default'):
+    """Загружает строки через COPY ... FROM STDIN (только PostgreSQL)."""
+    if not rows:
+        return
+    connection = connections[using]
+    columns, lines = copy_lines(model, rows, connection)
+    quoted = ', '.join(connection.ops.quote_name(column)
+                       for column in columns)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {connection.ops.quote_name(model._meta.db_table)} '
+            f'({quoted}) FROM STDIN',
+            io.StringIO(''.join(lines)),
+        )
+
+
+def reset_sequences(models, using='default'):
+    """Сдвигает последовательности id после загрузки с явными id."""
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,53 @@
+"""Management-команда. Выгружает таблицу модели в csv или NDJSON.
+Синтаксис:
+python manage.py exportcsv model_name [--output ndjson] [--file PATH]
+                           [--chunk-size N]
+
+Колонки совпадают с форматом loadcsv, поэтому выгрузку можно загрузить
+обратно. Строки читаются порциями, память не зависит от размера таблицы.
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from reviews.csv_tools import EXPORT_FORMATS, export_lines
+
+app_models = [model.__name__ for model in apps.get_models()]
+
+
+class Command(BaseCommand):
+    help = 'Выгружает таблицу модели в csv или NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model_name', type=str, help='Имя модели.')
+        parser.add_argument(
+            '--output', choices=EXPORT_FORMATS, default='csv',
+            help='Формат выгрузки.')
+        parser.add_argument(
+            '--file', type=str,
+            help='Файл выгрузки (по умолчанию стандартный вывод).')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Количество строк, читаемых из БД за раз.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Алиас базы данных.')
+
+    def handle(self, *args, **options):
+        if options['model_name'] not in app_models:
+            raise CommandError(
+                f'Модели "{options["model_name"]}" нет в приложении.')
+        model = apps.get_model(app_label='reviews',
+                               model_name=options['model_name'])
+        lines = export_lines(
+            model.objects.using(options['database']),
+            output=options['output'],
+            chunk_size=options['chunk_size'],
+        )
+        if options['file'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['file'], 'w', encoding='utf-8',
+                  newline='') as export_file:
+            export_file.writelines(lines)
@@ -0,0 +1,156 @@
+"""Management-команда. Загружает все csv-файлы каталога.
+Синтаксис:
+python manage.py loadall data_dir [--workers N] [--batch-size N] [--copy]
+                         [--resume]
+
+Порядок загрузки выводится из внешних ключей моделей reviews: модель
+загружается, когда загружены все модели, на которые она ссылается.
+Независимые модели загружаются параллельно в пуле процессов, каждая
+командой loadcsv. Поисковые индексы удаляются на время загрузки;
+индексы, последовательности id, рейтинги и статистика планировщика
+обновляются один раз в конце.
+"""
+import io
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from reviews.csv_tools import (find_csv_files, load_levels,
+                               model_dependencies, reset_sequences)
+from reviews.search import create_search_indexes, drop_search_indexes
+from reviews.signals import bulk_loaded
+
+
+def load_model(csv_path, model_name, options):
+    """Загружает один файл; выполняется в процессе пула."""
+    stdout = io.StringIO()
+    try:
+        call_command('loadcsv', csv_path, model_name, stdout=stdout,
+                     defer_finalize=True, **options)
+    finally:
+        # Соединение процесса пула не переживает задачу.
+        connections.close_all()
+    return stdout.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Загружает в базу данных все csv-файлы каталога.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('data_dir', type=str,
+                            help='Каталог с csv-файлами.')
+        parser.add_argument(
+            '--workers', type=int, default=min(4, os.cpu_count() or 1),
+            help='Количество процессов загрузки.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк в одной транзакции.')
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Загружать пакеты через COPY (только PostgreSQL).')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить каждый файл с его контрольной точки.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Алиас базы данных.')
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options['data_dir']):
+            raise CommandError(
+                f'Каталог не найден: {options["data_dir"]}')
+        models = apps.get_app_config('reviews').get_models()
+        files = find_csv_files(options['data_dir'], list(models))
+        if not files:
+            raise CommandError('В каталоге нет csv-файлов моделей.')
+        try:
+            levels = load_levels(files)
+        except ValueError as error:
+            raise CommandError(error)
+        self.using = options['database']
+        self.load_options = {
+            'batch_size': options['batch_size'],
+            'copy': options['copy'],
+            'resume': options['resume'],
+            'database': self.using,
+        }
+        self.stdout.write('Порядок загрузки: ' + ' -> '.join(
+            ', '.join(model.__name__ for model in level) for level in levels))
+
+        started = time.monotonic()
+        connection = connections[self.using]
+        drop_search_indexes(connection)
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            # SQLite допускает одного писателя, процессы только ждали бы.
+            self.stdout.write(self.style.WARNING(
+                'SQLite: файлы загружаются последовательно.'))
+            workers = 1
+        try:
+            if workers > 1:
+                self.load_parallel(files, workers)
+            else:
+                for level in levels:
+                    for model in level:
+                        self.stdout.write(load_model(
+                            files[model], model.__name__, self.load_options))
+        finally:
+            self.finalize(list(files))
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено файлов: {len(files)} за '
+            f'{time.monotonic() - started:.1f} с'))
+
+    def load_parallel(self, files, workers):
+        """Запускает модель, как только загружены её зависимости."""
+        pending = model_dependencies(set(files))
+        running = {}
+        failed = []
+        # Процессы пула наследуют открытые соединения при fork.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                for model in [model for model, needs in pending.items()
+                              if not needs]:
+                    del pending[model]
+                    running[executor.submit(
+                        load_model, files[model], model.__name__,
+                        self.load_options)] = model
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    model = running.pop(future)
+                    try:
+                        self.stdout.write(future.result())
+                    except Exception as error:
+                        failed.append(model.__name__)
+                        self.stderr.write(f'{model.__name__}: {error}')
+                        continue
+                    for needs in pending.values():
+                        needs.discard(model)
+        if failed or pending:
+            skipped = ', '.join(sorted(model.__name__ for model in pending))
+            raise CommandError(
+                f'Не загружены: {", ".join(failed)}. '
+                f'Пропущены из-за зависимостей: {skipped or "нет"}.')
+
+    def finalize(self, models):
+        """Работа, отложенная на конец загрузки."""
+        connection = connections[self.using]
+        reset_sequences(models, using=self.using)
+        for model in models:
+            bulk_loaded.send(sender=model, using=self.using)
+        self.stdout.write('Создание поисковых индексов...')
+        create_search_indexes(connection)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                for model in models:
+                    cursor.execute('ANALYZE ' + connection.ops.quote_name(
+                        model._meta.db_table))
+            elif connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
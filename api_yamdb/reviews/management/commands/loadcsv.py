@@ -1,14 +1,27 @@
 """Management-команда. Заполняет БД данными из csv-файлов.
 Синтаксис:
-python manage.py loadcsv csv_path model_name
+python manage.py loadcsv csv_path model_name [--batch-size N] [--copy]
+                         [--resume | --resume-from ROW] [--reject-file PATH]
+
+Файл читается потоково и загружается пакетами, каждый пакет в своей
+транзакции. После каждого пакета номер последней строки записывается
+в файл контрольной точки, с которого можно продолжить загрузку.
+Строки, которые не удалось загрузить, пишутся в файл отклонённых строк.
 """
+import csv
+import os
+import time
+from itertools import islice
+
 import pyfiglet
-from csv import DictReader
 from django.apps import apps
 from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from reviews.csv_tools import copy_rows, reset_sequences, row_to_kwargs
+from reviews.signals import bulk_loaded
 
 app_models = [model.__name__ for model in apps.get_models()]
-rename_csv_fields = {'category': 'category_id', 'author': 'author_id'}
 
 
 class Command(BaseCommand):
@@ -17,6 +30,31 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('csv_path', type=str, help='Путь к файлу csv.')
         parser.add_argument('model_name', type=str, help='Имя модели.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк в одной транзакции.')
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Загружать пакеты через COPY (только PostgreSQL).')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с контрольной точки прошлого запуска.')
+        parser.add_argument(
+            '--resume-from', type=int, default=1,
+            help='Номер строки данных (с 1), с которой начать загрузку.')
+        parser.add_argument(
+            '--checkpoint', type=str,
+            help='Файл контрольной точки (по умолчанию <csv>.checkpoint).')
+        parser.add_argument(
+            '--reject-file', type=str,
+            help='Файл отклонённых строк (по умолчанию <csv>.rejected.csv).')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Алиас базы данных.')
+        parser.add_argument(
+            '--defer-finalize', action='store_true',
+            help='Не сбрасывать последовательности и не пересчитывать '
+                 'рейтинги (это сделает вызывающая команда).')
 
     def handle(self, *args, **options):
         if options['model_name'] not in app_models:
@@ -24,28 +62,34 @@ class Command(BaseCommand):
                 f'Модели "{options["model_name"]}" нет в приложении.')
         model = apps.get_model(app_label='reviews',
                                model_name=options['model_name'])
+        csv_path = options['csv_path']
+        start_row, use_copy = self.configure(csv_path, options)
 
         try:
-            incoming_data = DictReader(
-                open(options['csv_path'], 'r', encoding="utf-8-sig"))
+            csv_file = open(csv_path, 'r', encoding='utf-8-sig', newline='')
         except FileNotFoundError:
-            raise FileNotFoundError(
-                f'Файл не найден или некорректный путь {options["csv_path"]}')
+            raise CommandError(
+                f'Файл не найден или некорректный путь {csv_path}')
 
-        try:
-            model.objects.bulk_create([
-                model(
-                    **{
-                        rename_csv_fields.get(key) if rename_csv_fields.
-                        get(key) else key: value
-                        for key, value in row.items()
-                    }) for row in incoming_data
-            ])
-        except Exception as error:
+        started = time.monotonic()
+        with csv_file:
+            loaded, rejected = self.load_stream(
+                csv_file, model, start_row, options['batch_size'], use_copy)
+        if self.reject_file is not None:
+            self.reject_file.close()
+
+        if not options['defer_finalize']:
+            if 'id' in self.fieldnames:
+                reset_sequences([model], using=self.using)
+            bulk_loaded.send(sender=model, using=self.using)
+        elapsed = time.monotonic() - started
+
+        if rejected:
             presult = pyfiglet.figlet_format("Error", font="slant")
-            raise self.stdout.write(
+            self.stdout.write(
                 self.style.ERROR(
-                    f'Возникла ошибка при импорте данных в модель: {error}'
+                    f'Отклонено строк: {rejected}, '
+                    f'они записаны в {self.reject_path}'
                     '\n======================================================='
                     f'\n{presult}'
                     '========================================================='
@@ -53,9 +97,115 @@ class Command(BaseCommand):
         presult = pyfiglet.figlet_format("Success", font="slant")
         self.stdout.write(
             self.style.SUCCESS(
-                f'Данные из {options["csv_path"].split("/")[2]} '
-                f'были успешно загружены в модель {options["model_name"]}'
+                f'Данные из {os.path.basename(csv_path)} '
+                f'были загружены в модель {options["model_name"]}: '
+                f'{loaded} строк за {elapsed:.1f} с'
                 '\n==========================================================='
                 f'\n{presult}'
                 '============================================================='
             ))
+
+    def configure(self, csv_path, options):
+        """Читает параметры; возвращает первую строку и режим COPY."""
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        self.using = options['database']
+        self.checkpoint_path = (options['checkpoint']
+                                or f'{csv_path}.checkpoint')
+        self.reject_path = options['reject_file'] or f'{csv_path}.rejected.csv'
+        self.reject_file = None
+        self.reject_writer = None
+        self.fieldnames = []
+        use_copy = options['copy']
+        if use_copy and connections[self.using].vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                'COPY доступен только в PostgreSQL, загрузка через ORM.'))
+            use_copy = False
+        if options['resume']:
+            return self.read_checkpoint() + 1, use_copy
+        return options['resume_from'], use_copy
+
+    def load_stream(self, csv_file, model, start_row, batch_size, use_copy):
+        """Читает csv пакетами, не держа файл в памяти целиком."""
+        loaded = rejected = 0
+        row_number = start_row - 1
+        started = time.monotonic()
+        reader = csv.DictReader(csv_file)
+        self.fieldnames = reader.fieldnames or []
+        rows = islice(reader, start_row - 1, None)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            first_row = row_number + 1
+            row_number += len(batch)
+            batch_loaded = self.load_batch(model, batch, first_row, use_copy)
+            loaded += batch_loaded
+            rejected += len(batch) - batch_loaded
+            self.write_checkpoint(row_number)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'Строк {row_number}: загружено {loaded}, '
+                f'отклонено {rejected}, '
+                f'{(loaded + rejected) / elapsed:.0f} строк/с')
+        return loaded, rejected
+
+    def load_batch(self, model, batch, first_row, use_copy):
+        """Загружает пакет одной транзакцией.
+
+        Если пакет не прошёл целиком, строки загружаются по одной,
+        чтобы отделить плохие. Возвращает число загруженных строк.
+        """
+        try:
+            with transaction.atomic(using=self.using):
+                if use_copy:
+                    copy_rows(model, batch, using=self.using)
+                else:
+                    model.objects.using(self.using).bulk_create(
+                        [model(**row_to_kwargs(row, model)) for row in batch])
+            return len(batch)
+        except Exception as error:
+            # Плохую строку найдёт загрузка по одной, но ошибка пакета
+            # (например, COPY) не должна теряться.
+            self.stderr.write(self.style.WARNING(
+                f'Пакет со строки {first_row} не загружен: '
+                f'{str(error).strip()}. Загрузка по одной строке.'))
+
+        loaded = 0
+        for offset, row in enumerate(batch):
+            try:
+                with transaction.atomic(using=self.using):
+                    model(**row_to_kwargs(row, model)).save(
+                        force_insert=True, using=self.using)
+                loaded += 1
+            except Exception as error:
+                self.reject(first_row + offset, row, error)
+        return loaded
+
+    def reject(self, row_number, row, error):
+        if self.reject_writer is None:
+            self.reject_file = open(self.reject_path, 'a', encoding='utf-8',
+                                    newline='')
+            self.reject_writer = csv.writer(self.reject_file)
+            if self.reject_file.tell() == 0:
+                self.reject_writer.writerow(
+                    ['row', *self.fieldnames, 'error'])
+        self.reject_writer.writerow(
+            [row_number, *(row.get(key) for key in self.fieldnames),
+             str(error).strip()])
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as checkpoint:
+                return int(checkpoint.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+        except ValueError:
+            raise CommandError(
+                f'Некорректный файл контрольной точки {self.checkpoint_path}')
+
+    def write_checkpoint(self, row_number):
+        temporary_path = f'{self.checkpoint_path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as checkpoint:
+            checkpoint.write(str(row_number))
+        os.replace(temporary_path, self.checkpoint_path)
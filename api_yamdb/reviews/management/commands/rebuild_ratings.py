@@ -0,0 +1,46 @@
+"""Management-команда. Пересчитывает хранимые рейтинги произведений.
+Синтаксис:
+python manage.py rebuild_ratings [--check]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from reviews.ratings import find_stale_ratings, rebuild_title_ratings
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает score_sum/review_count произведений '
+            'по таблице отзывов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить агрегаты, ничего не изменяя.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Размер пакета для bulk_update.',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            stale = 0
+            for title, (actual_sum, actual_count) in find_stale_ratings():
+                stale += 1
+                self.stdout.write(
+                    f'{title.pk} "{title.name}": '
+                    f'хранится {title.score_sum}/{title.review_count}, '
+                    f'по отзывам {actual_sum}/{actual_count}')
+            if stale:
+                raise CommandError(
+                    f'Расхождения в рейтингах произведений: {stale}.')
+            self.stdout.write(self.style.SUCCESS('Рейтинги согласованы.'))
+            return
+
+        with transaction.atomic():
+            fixed = rebuild_title_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано произведений: {fixed}.'))
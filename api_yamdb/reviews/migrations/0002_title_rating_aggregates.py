@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:02
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+    db_alias = schema_editor.connection.alias
+    totals = (Review.objects.using(db_alias)
+              .filter(score__isnull=False)
+              .values('title_id')
+              .annotate(total=Sum('score'), count=Count('id'))
+              .order_by())
+    for row in totals.iterator():
+        Title.objects.using(db_alias).filter(pk=row['title_id']).update(
+            score_sum=row['total'], review_count=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество оценок'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_rating_aggregates,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:05
+
+from django.db import migrations
+
+# SQL зафиксирован в миграции: она не должна меняться вместе
+# с reviews.search. Выражение индекса совпадает с PG_DOCUMENT.
+PG_CREATE_SQL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS reviews_title_search_idx '
+    "ON reviews_title USING gin ((to_tsvector('simple'::regconfig, "
+    "coalesce(name, '') || ' ' || coalesce(description, ''))))",
+    'CREATE INDEX IF NOT EXISTS reviews_title_name_trgm_idx '
+    'ON reviews_title USING gin (name gin_trgm_ops)',
+)
+PG_DROP_SQL = (
+    'DROP INDEX IF EXISTS reviews_title_search_idx',
+    'DROP INDEX IF EXISTS reviews_title_name_trgm_idx',
+)
+
+SQLITE_CREATE_SQL = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS reviews_title_fts '
+    "USING fts5(name, description, content='reviews_title', "
+    "content_rowid='id')",
+    'CREATE TRIGGER IF NOT EXISTS reviews_title_fts_ai '
+    'AFTER INSERT ON reviews_title BEGIN '
+    'INSERT INTO reviews_title_fts(rowid, name, description) '
+    'VALUES (new.id, new.name, new.description); END',
+    'CREATE TRIGGER IF NOT EXISTS reviews_title_fts_ad '
+    'AFTER DELETE ON reviews_title BEGIN '
+    'INSERT INTO reviews_title_fts(reviews_title_fts, rowid, name, '
+    "description) VALUES ('delete', old.id, old.name, old.description); "
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS reviews_title_fts_au '
+    'AFTER UPDATE OF name, description ON reviews_title BEGIN '
+    'INSERT INTO reviews_title_fts(reviews_title_fts, rowid, name, '
+    "description) VALUES ('delete', old.id, old.name, old.description); "
+    'INSERT INTO reviews_title_fts(rowid, name, description) '
+    'VALUES (new.id, new.name, new.description); END',
+    "INSERT INTO reviews_title_fts(reviews_title_fts) VALUES ('rebuild')",
+)
+SQLITE_DROP_SQL = (
+    'DROP TRIGGER IF EXISTS reviews_title_fts_ai',
+    'DROP TRIGGER IF EXISTS reviews_title_fts_ad',
+    'DROP TRIGGER IF EXISTS reviews_title_fts_au',
+    'DROP TABLE IF EXISTS reviews_title_fts',
+)
+
+SQL = {
+    'postgresql': (PG_CREATE_SQL, PG_DROP_SQL),
+    'sqlite': (SQLITE_CREATE_SQL, SQLITE_DROP_SQL),
+}
+
+
+def create_indexes(apps, schema_editor):
+    create_sql, _ = SQL.get(schema_editor.connection.vendor, ((), ()))
+    for sql in create_sql:
+        schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    _, drop_sql = SQL.get(schema_editor.connection.vendor, ((), ()))
+    for sql in drop_sql:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_title_modified'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,5 +1,5 @@
 # reviews/models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
 
@@ -76,6 +76,14 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Имя автора выводится в отзывах и комментариях: его смену
+        # замечает reviews/signals.py.
+        instance._loaded_username = instance.__dict__.get('username')
+        return instance
+
     @property
     def is_administrator(self):
         return (self.role == self.ROLE_NAME_ADMIN or self.is_staff
@@ -134,6 +142,18 @@ class Title(models.Model):
         blank=True,
         null=True,
     )
+    score_sum = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Сумма оценок',
+    )
+    review_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество оценок',
+    )
+    modified = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
 
     class Meta():
         verbose_name = 'Произведение'
@@ -142,6 +162,13 @@ class Title(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def rating(self):
+        """Средняя оценка по хранимым агрегатам, без запроса к отзывам."""
+        if not self.review_count:
+            return None
+        return self.score_sum / self.review_count
+
 
 class GenreTitle(models.Model):
     genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
@@ -187,6 +214,22 @@ class Review(PubDateIdOrder):
     def __str__(self):
         return self.text[:30]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_rating_state()
+        return instance
+
+    def remember_rating_state(self):
+        """Запоминает вклад отзыва в рейтинг произведения."""
+        self._loaded_title_id = self.__dict__.get('title_id')
+        self._loaded_score = self.__dict__.get('score')
+
+    def save(self, *args, **kwargs):
+        # Агрегаты произведения обновляются сигналом в этой же транзакции.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 
 class Comment(PubDateIdOrder):
     review = models.ForeignKey(Review,
@@ -0,0 +1,91 @@
+# reviews/ratings.py
+"""Хранимые агрегаты рейтинга произведений.
+
+Title.score_sum и Title.review_count меняются приращениями в той же
+транзакции, что и отзыв, поэтому при чтении рейтинга не нужен
+Avg() по таблице отзывов.
+"""
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Title
+
+
+def review_contribution(score):
+    """Вклад отзыва в агрегаты: (сумма, количество)."""
+    if score is None:
+        return 0, 0
+    return score, 1
+
+
+def apply_score_delta(title_id, score_delta, count_delta, using=None):
+    """Атомарно сдвигает агрегаты одного произведения.
+
+    Тем же UPDATE обновляется отметка изменения произведения, даже если
+    оценка не поменялась: от неё зависят ETag отзывов и произведения.
+    """
+    if title_id is None:
+        return
+    Title.objects.using(using).filter(pk=title_id).update(
+        score_sum=F('score_sum') + score_delta,
+        review_count=F('review_count') + count_delta,
+        modified=timezone.now(),
+    )
+
+
+def apply_review_change(old_title_id, old_score, new_title_id, new_score,
+                        using=None):
+    """Переносит вклад отзыва со старого состояния на новое."""
+    old_sum, old_count = review_contribution(old_score)
+    new_sum, new_count = review_contribution(new_score)
+    if old_title_id == new_title_id:
+        apply_score_delta(new_title_id, new_sum - old_sum,
+                          new_count - old_count, using=using)
+        return
+    apply_score_delta(old_title_id, -old_sum, -old_count, using=using)
+    apply_score_delta(new_title_id, new_sum, new_count, using=using)
+
+
+def find_stale_ratings(queryset=None):
+    """Итерирует произведения, у которых агрегаты расходятся с отзывами.
+
+    Возвращает пары (title, (сумма, количество)) с фактическими значениями.
+    Все агрегаты считаются одним сгруппированным запросом.
+    """
+    if queryset is None:
+        queryset = Title.objects.all()
+    titles = queryset.annotate(
+        actual_sum=Coalesce(Sum('reviews__score'), 0),
+        actual_count=Count('reviews__score'),
+    ).only('id', 'name', 'score_sum', 'review_count').order_by('id')
+    for title in titles.iterator():
+        actual = (title.actual_sum, title.actual_count)
+        if (title.score_sum, title.review_count) != actual:
+            yield title, actual
+
+
+def rebuild_title_ratings(queryset=None, batch_size=500):
+    """Пересчитывает агрегаты и сохраняет только расходящиеся.
+
+    Возвращает количество исправленных произведений.
+    """
+    if queryset is None:
+        queryset = Title.objects.all()
+    manager = Title.objects.db_manager(queryset.db)
+    fields = ('score_sum', 'review_count', 'modified')
+    fixed = 0
+    batch = []
+    for title, (actual_sum, actual_count) in find_stale_ratings(queryset):
+        title.score_sum = actual_sum
+        title.review_count = actual_count
+        title.modified = timezone.now()
+        batch.append(title)
+        if len(batch) >= batch_size:
+            manager.bulk_update(batch, fields)
+            fixed += len(batch)
+            batch = []
+    if batch:
+        manager.bulk_update(batch, fields)
+        fixed += len(batch)
+    return fixed
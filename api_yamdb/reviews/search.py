@@ -0,0 +1,164 @@
+# reviews/search.py
+"""Полнотекстовый поиск произведений.
+
+PostgreSQL: GIN-индекс по tsvector(name, description) и триграммный
+GIN-индекс по name (pg_trgm), ранжирование ts_rank + similarity.
+SQLite: внешняя таблица FTS5, синхронизируемая триггерами, ранжирование
+bm25. На других СУБД поиск сводится к icontains по словам запроса.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Func, Q
+
+TITLE_TABLE = 'reviews_title'
+FTS_TABLE = 'reviews_title_fts'
+MAX_SEARCH_WORDS = 10
+
+# Выражение индекса и выражение в запросе должны совпадать,
+# иначе планировщик PostgreSQL не использует индекс.
+PG_DOCUMENT = ("to_tsvector('simple'::regconfig, "
+               "coalesce({name}, '') || ' ' || coalesce({description}, ''))")
+PG_INDEX_DOCUMENT = PG_DOCUMENT.format(name='name', description='description')
+
+PG_CREATE_SQL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX IF NOT EXISTS reviews_title_search_idx '
+    f'ON {TITLE_TABLE} USING gin (({PG_INDEX_DOCUMENT}))',
+    f'CREATE INDEX IF NOT EXISTS reviews_title_name_trgm_idx '
+    f'ON {TITLE_TABLE} USING gin (name gin_trgm_ops)',
+)
+PG_DROP_SQL = (
+    'DROP INDEX IF EXISTS reviews_title_search_idx',
+    'DROP INDEX IF EXISTS reviews_title_name_trgm_idx',
+)
+
+SQLITE_TRIGGERS = {
+    'reviews_title_fts_ai': (
+        f'AFTER INSERT ON {TITLE_TABLE} BEGIN '
+        f'INSERT INTO {FTS_TABLE}(rowid, name, description) '
+        f'VALUES (new.id, new.name, new.description); END'),
+    'reviews_title_fts_ad': (
+        f'AFTER DELETE ON {TITLE_TABLE} BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) '
+        f"VALUES ('delete', old.id, old.name, old.description); END"),
+    'reviews_title_fts_au': (
+        f'AFTER UPDATE OF name, description ON {TITLE_TABLE} BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) '
+        f"VALUES ('delete', old.id, old.name, old.description); "
+        f'INSERT INTO {FTS_TABLE}(rowid, name, description) '
+        f'VALUES (new.id, new.name, new.description); END'),
+}
+
+
+def create_search_indexes(connection):
+    """Создаёт поисковые индексы, если их ещё нет."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in PG_CREATE_SQL:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            # Пересборка таблиц в миграциях SQLite удаляет триггеры,
+            # поэтому они проверяются и при каждом post_migrate.
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                "AND tbl_name = %s", [TITLE_TABLE])
+            existing = {row[0] for row in cursor.fetchall()}
+            if set(SQLITE_TRIGGERS) <= existing:
+                return
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                f'USING fts5(name, description, '
+                f"content='{TITLE_TABLE}', content_rowid='id')")
+            for name, body in SQLITE_TRIGGERS.items():
+                cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_indexes(connection):
+    """Удаляет поисковые индексы (например, на время массовой загрузки)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in PG_DROP_SQL:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def split_query(query):
+    return re.findall(r'\w+', query.lower())[:MAX_SEARCH_WORDS]
+
+
+class TitleSQL(Func):
+    """Фрагмент SQL с колонками произведения {id}, {name}, {description}.
+
+    Колонки компилируются ORM, поэтому выражение остаётся верным
+    и внутри подзапросов, где у таблицы другой псевдоним.
+    """
+
+    def __init__(self, sql, params, output_field):
+        super().__init__(F('id'), F('name'), F('description'),
+                         output_field=output_field)
+        self.sql = sql
+        self.sql_params = tuple(params)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        columns = {}
+        for key, expression in zip(('id', 'name', 'description'),
+                                   self.source_expressions):
+            columns[key], _ = compiler.compile(expression)
+        return self.sql.format(**columns), list(self.sql_params)
+
+
+def search_postgresql(queryset, words, query):
+    # Каждое слово ищется по префиксу, чтобы поиск работал по мере ввода.
+    tsquery = ' & '.join(f'{word}:*' for word in words)
+    match = TitleSQL(
+        f"({PG_DOCUMENT} @@ to_tsquery('simple', %s) OR {{name}} %% %s)",
+        (tsquery, query), BooleanField())
+    rank = TitleSQL(
+        f"ts_rank({PG_DOCUMENT}, to_tsquery('simple', %s)) "
+        '+ similarity({name}, %s)',
+        (tsquery, query), FloatField())
+    return queryset.annotate(
+        search_match=match, search_rank=rank,
+    ).filter(search_match=True)
+
+
+def search_sqlite(queryset, words):
+    match = ' '.join(f'"{word}"*' for word in words)
+    # Не pk__in=RawSQL(...): SQLite читает IN ((SELECT ...)) как
+    # скалярный подзапрос и возвращает только первую строку.
+    matched = TitleSQL(
+        f'({{id}} IN (SELECT rowid FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s))',
+        (match, ), BooleanField())
+    rank = TitleSQL(
+        f'(SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid = {{id}})',
+        (match, ), FloatField())
+    return queryset.annotate(
+        search_match=matched, search_rank=rank,
+    ).filter(search_match=True)
+
+
+def search_titles(queryset, query):
+    """Фильтрует произведения по запросу и сортирует по релевантности."""
+    words = split_query(query)
+    if not words:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        queryset = search_postgresql(queryset, words, query)
+    elif vendor == 'sqlite':
+        queryset = search_sqlite(queryset, words)
+    else:
+        condition = Q()
+        for word in words:
+            condition &= (Q(name__icontains=word)
+                          | Q(description__icontains=word))
+        return queryset.filter(condition).order_by('-id')
+    return queryset.order_by('-search_rank', '-id')
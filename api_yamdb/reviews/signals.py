@@ -0,0 +1,113 @@
+# reviews/signals.py
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.db.models import Q
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import (Category, Comment, Genre, GenreTitle, Review, Title,
+                     User)
+from .ratings import apply_review_change, rebuild_title_ratings
+
+# Отправляется после массовой загрузки строк модели в обход save()
+# (bulk_create, COPY), когда обычные сигналы моделей не срабатывают.
+bulk_loaded = Signal(providing_args=['using'])
+
+
+def touch_titles(queryset):
+    """Сдвигает отметку изменения произведений одним UPDATE."""
+    queryset.update(modified=timezone.now())
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_review_save(sender, instance, created, raw, using,
+                                 **kwargs):
+    """Учитывает созданный или изменённый отзыв в рейтинге произведения.
+
+    При loaddata (raw=True) агрегаты не трогаем: после загрузки фикстур
+    их пересчитывает команда rebuild_ratings.
+    """
+    if raw:
+        return
+    old_title_id = None if created else getattr(
+        instance, '_loaded_title_id', None)
+    old_score = None if created else getattr(instance, '_loaded_score', None)
+    apply_review_change(old_title_id, old_score,
+                        instance.title_id, instance.score, using=using)
+    instance.remember_rating_state()
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_review_delete(sender, instance, using, **kwargs):
+    """Убирает удалённый отзыв из рейтинга произведения."""
+    apply_review_change(
+        getattr(instance, '_loaded_title_id', instance.title_id),
+        getattr(instance, '_loaded_score', instance.score),
+        None, None, using=using)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_title_on_comment_change(sender, instance, using, raw=False,
+                                  **kwargs):
+    if raw:
+        return
+    touch_titles(Title.objects.using(using).filter(
+        reviews=instance.review_id))
+
+
+@receiver(post_save, sender=Genre)
+def touch_titles_on_genre_change(sender, instance, created, raw, using,
+                                 **kwargs):
+    if created or raw:
+        return
+    touch_titles(Title.objects.using(using).filter(genre=instance))
+
+
+@receiver(post_save, sender=Category)
+def touch_titles_on_category_change(sender, instance, created, raw, using,
+                                    **kwargs):
+    if created or raw:
+        return
+    touch_titles(Title.objects.using(using).filter(category=instance))
+
+
+@receiver(post_save, sender=User)
+def touch_titles_on_username_change(sender, instance, created, raw, using,
+                                    **kwargs):
+    """Отзывы и комментарии показывают имя автора: после его смены
+    ETag их списков должен измениться."""
+    loaded_username = getattr(instance, '_loaded_username', None)
+    instance._loaded_username = instance.username
+    if created or raw or loaded_username in (None, instance.username):
+        return
+    touch_titles(Title.objects.using(using).filter(
+        pk__in=Review.objects.using(using).filter(
+            Q(author=instance) | Q(comments__author=instance),
+        ).values('title_id')))
+
+
+@receiver(pre_delete, sender=Genre)
+def touch_titles_on_genre_delete(sender, instance, using, **kwargs):
+    touch_titles(Title.objects.using(using).filter(genre=instance))
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def touch_title_on_genre_set(sender, instance, action, reverse, pk_set,
+                             using, **kwargs):
+    if action == 'pre_clear' and reverse:
+        touch_titles(Title.objects.using(using).filter(genre=instance))
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        touch_titles(Title.objects.using(using).filter(pk=instance.pk))
+    elif pk_set:
+        touch_titles(Title.objects.using(using).filter(pk__in=pk_set))
+
+
+@receiver(bulk_loaded)
+def refresh_titles_after_bulk_load(sender, using, **kwargs):
+    if sender is Review:
+        rebuild_title_ratings(Title.objects.using(using))
+    if sender in (Review, Comment, GenreTitle, Genre, Category):
+        touch_titles(Title.objects.using(using))
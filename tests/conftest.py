@@ -1,9 +1,30 @@
 import sys
 from os.path import abspath, dirname, join
 
+import pytest
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 infra_dir_path = join(root_dir, 'infra')
 
 pytest_plugins = [
+    'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(settings, tmp_path_factory):
+    """Общий для процессов кэш, как memcached в docker-compose.
+
+    У каждого теста свой каталог: версии и лимиты запросов
+    не переходят между тестами.
+    """
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path_factory.mktemp('cache')),
+        },
+    }
+    settings.API_THROTTLE = dict(settings.API_THROTTLE, OPTIONS={
+        'PATH': str(tmp_path_factory.mktemp('throttle') / 'buckets'),
+    })
@@ -0,0 +1,31 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.test import Client
+
+
+@pytest.mark.django_db
+class TestApiMiddleware:
+
+    def test_api_skips_browser_middleware(self):
+        response = Client().get('/api/v1/categories/')
+        assert response.status_code == 200
+        assert 'X-Frame-Options' not in response, (
+            'Проверьте, что clickjacking-middleware пропускает /api/'
+        )
+        assert not hasattr(response.wsgi_request, 'session'), (
+            'Проверьте, что сессии не загружаются для /api/'
+        )
+
+    def test_admin_keeps_full_pipeline(self):
+        response = Client().get('/admin/login/')
+        assert response.status_code == 200
+        assert 'X-Frame-Options' in response
+        assert 'csrftoken' in response.cookies
+
+    def test_benchmark_runs(self):
+        stdout = StringIO()
+        call_command('benchmark_middleware', '--requests', '20',
+                     stdout=stdout)
+        assert '/api/v1/ping/' in stdout.getvalue()
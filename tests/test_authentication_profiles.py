@@ -0,0 +1,47 @@
+import base64
+
+import pytest
+from rest_framework.test import APIClient
+
+from api.authentication import basic_auth_checks
+
+
+def basic_client(username, password):
+    credentials = base64.b64encode(
+        f'{username}:{password}'.encode('utf-8')).decode('ascii')
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Basic {credentials}')
+    return client
+
+
+@pytest.mark.django_db
+class TestAuthenticationProfiles:
+
+    @pytest.fixture
+    def admin(self, user):
+        user.role = user.ROLE_NAME_ADMIN
+        user.save()
+        return user
+
+    def test_api_ignores_basic_credentials(self, admin):
+        response = basic_client(admin.username, '1234567').post(
+            '/api/v1/categories/', {'name': 'Книга', 'slug': 'book'})
+        assert response.status_code == 401, (
+            'Проверьте, что /api/v1/ принимает только JWT'
+        )
+
+    def test_basic_credentials_are_hashed_once(self, admin):
+        client = basic_client(admin.username, '1234567')
+        hashed = basic_auth_checks.value('hash')
+        for _ in range(3):
+            assert client.get('/api/v1/export/titles/').status_code == 200
+        assert basic_auth_checks.value('hash') == hashed + 1, (
+            'Проверьте, что повторные запросы не хэшируют пароль заново'
+        )
+
+    def test_password_change_drops_cached_credentials(self, admin):
+        client = basic_client(admin.username, '1234567')
+        assert client.get('/api/v1/export/titles/').status_code == 200
+        admin.set_password('7654321')
+        admin.save()
+        assert client.get('/api/v1/export/titles/').status_code == 401
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from api import conditional
+from reviews.models import Comment, Review, Title
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+
+    def test_reviews_not_modified(self, title, user, monkeypatch):
+        Review.objects.create(title=title, author=user, text='Ок', score=7)
+        now = conditional.time.time() + 1
+        monkeypatch.setattr(conditional.time, 'time', lambda: now)
+        client = APIClient()
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        response = client.get(url)
+        etag = response['ETag']
+        assert etag.startswith('"') and response.has_header('Last-Modified')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, (
+            'Проверьте, что при совпадении ETag возвращается 304'
+        )
+        assert not response.content
+        assert len(queries) == 1, (
+            'Проверьте, что ответ 304 не выбирает и не сериализует отзывы'
+        )
+        assert response['ETag'] == etag
+
+    def test_writes_advance_marker(self, title, user, another_user):
+        review = Review.objects.create(
+            title=title, author=user, text='Ок', score=7)
+        client = APIClient()
+        urls = (
+            f'/api/v1/titles/{title.id}/',
+            f'/api/v1/titles/{title.id}/reviews/',
+            f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/',
+        )
+        etags = {url: client.get(url)['ETag'] for url in urls}
+        Comment.objects.create(review=review, author=another_user, text='Да')
+        for url in urls:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            assert response.status_code == 200, (
+                'Проверьте, что новая запись меняет ETag произведения'
+            )
+            assert response['ETag'] != etags[url]
+
+    def test_username_change_advances_marker(self, title, user,
+                                             another_user):
+        review = Review.objects.create(
+            title=title, author=user, text='Ок', score=7)
+        Comment.objects.create(review=review, author=another_user, text='Да')
+        client = APIClient()
+        url = f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/'
+        etag = client.get(url)['ETag']
+        another_user.username = 'renamed'
+        another_user.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, (
+            'Проверьте, что смена имени автора меняет ETag'
+        )
+        assert response.json()['results'][0]['author'] == 'renamed'
+
+    def test_two_writes_in_one_second(self, title, monkeypatch):
+        first = title.modified.replace(microsecond=100000)
+        Title.objects.filter(pk=title.pk).update(modified=first)
+        monkeypatch.setattr(conditional.time, 'time',
+                            lambda: first.timestamp() + 0.1)
+        client = APIClient()
+        url = f'/api/v1/titles/{title.id}/'
+        assert not client.get(url).has_header('Last-Modified'), (
+            'Проверьте, что Last-Modified не отдаётся, пока не кончилась '
+            'секунда последней записи'
+        )
+        Title.objects.filter(pk=title.pk).update(
+            modified=first + timedelta(microseconds=500000))
+        response = client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date(int(first.timestamp())))
+        assert response.status_code == 200, (
+            'Проверьте, что вторая запись в ту же секунду не даёт 304'
+        )
+        monkeypatch.setattr(conditional.time, 'time',
+                            lambda: first.timestamp() + 1)
+        last_modified = client.get(url)['Last-Modified']
+        assert client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+
+    def test_missing_parent_is_404(self, title):
+        response = APIClient().get(f'/api/v1/titles/{title.id}/reviews/1/'
+                                   'comments/')
+        assert response.status_code == 404
@@ -0,0 +1,159 @@
+import threading
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_started
+from django.db import connection
+from django.db.utils import ConnectionHandler
+
+from api.database import (ConnectionPool, PoolTimeout, close_pools,
+                          get_pool, pool_connections)
+from api_yamdb.settings import DB_POOL_ENGINE
+
+requires_postgresql = pytest.mark.skipif(
+    connection.vendor != 'postgresql', reason='нужен PostgreSQL')
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**options):
+    return ConnectionPool('test', ping=lambda raw: not raw.closed,
+                          reset=lambda raw: not raw.closed, options=options)
+
+
+class TestConnectionPool:
+
+    def test_reuses_connections(self):
+        pool = make_pool(MAX_SIZE=2)
+        first = pool.checkout(FakeConnection)
+        pool.checkin(first)
+        assert pool.checkout(FakeConnection) is first, (
+            'Проверьте, что пул отдаёт возвращённое соединение'
+        )
+        assert pool_connections.value('test', 'in_use') == 1
+
+    def test_waits_for_free_connection(self):
+        pool = make_pool(MAX_SIZE=1, TIMEOUT=0.05)
+        raw = pool.checkout(FakeConnection)
+        with pytest.raises(PoolTimeout):
+            pool.checkout(FakeConnection)
+        threading.Timer(0.01, pool.checkin, args=(raw, )).start()
+        pool.timeout = 5
+        assert pool.checkout(FakeConnection) is raw
+
+    def test_dead_connection_replaced(self):
+        pool = make_pool(MAX_SIZE=1, HEALTH_CHECK_IDLE=0)
+        raw = pool.checkout(FakeConnection)
+        pool.checkin(raw)
+        raw.closed = True
+        assert pool.checkout(FakeConnection) is not raw, (
+            'Проверьте, что пул не отдаёт закрытые соединения'
+        )
+
+    def test_close_pools_before_fork(self):
+        pool = get_pool('test', make_pool)
+        raw = pool.checkout(FakeConnection)
+        pool.checkin(raw)
+        close_pools()
+        assert raw.closed, (
+            'Проверьте, что свободные соединения пула закрываются '
+            'перед fork'
+        )
+        assert get_pool('test', make_pool) is not pool
+
+
+@pytest.mark.django_db(transaction=True)
+class TestHealthChecks:
+
+    def test_unusable_connection_closed(self, monkeypatch):
+        connection.ensure_connection()
+        monkeypatch.setitem(connection.settings_dict,
+                            'CONN_HEALTH_CHECKS', True)
+        monkeypatch.setitem(connection.settings_dict,
+                            'CONN_HEALTH_CHECK_IDLE', 0)
+        monkeypatch.setattr(connection, 'is_usable', lambda: False)
+        closed = []
+        monkeypatch.setattr(connection, 'close', lambda: closed.append(1))
+        request_started.send(sender=None)
+        assert closed, (
+            'Проверьте, что неработающее соединение закрывается '
+            'перед запросом'
+        )
+
+    def test_recently_used_connection_not_pinged(self, monkeypatch):
+        monkeypatch.setitem(connection.settings_dict,
+                            'CONN_HEALTH_CHECKS', True)
+        monkeypatch.setitem(connection.settings_dict,
+                            'CONN_HEALTH_CHECK_IDLE', 60)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        pings = []
+        monkeypatch.setattr(connection, 'is_usable',
+                            lambda: pings.append(1) or True)
+        request_started.send(sender=None)
+        assert not pings, (
+            'Проверьте, что только что работавшее соединение '
+            'не проверяется перед запросом'
+        )
+
+
+def pool_handler(**settings_dict):
+    return ConnectionHandler({
+        'default': dict(connection.settings_dict),
+        'pool-test': dict(connection.settings_dict, ENGINE=DB_POOL_ENGINE,
+                          **settings_dict),
+    })
+
+
+class TestPoolBackend:
+
+    def test_conn_max_age_must_be_zero(self):
+        with pytest.raises(ImproperlyConfigured):
+            pool_handler(CONN_MAX_AGE=60)['pool-test']
+        assert pool_handler(CONN_MAX_AGE=0)['pool-test'].vendor == (
+            'postgresql')
+
+    @requires_postgresql
+    @pytest.mark.django_db
+    def test_request_returns_connection_to_pool(self):
+        handler = pool_handler(CONN_MAX_AGE=0, POOL={'MAX_SIZE': 1})
+        wrapper = handler['pool-test']
+        try:
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            raw = wrapper.connection
+            assert pool_connections.value('pool-test', 'in_use') == 1
+            # Так соединение закрывает request_finished.
+            wrapper.close_if_unusable_or_obsolete()
+            assert wrapper.connection is None and not raw.closed
+            assert pool_connections.value('pool-test', 'in_use') == 0, (
+                'Проверьте, что в конце запроса соединение '
+                'возвращается в пул'
+            )
+
+            reused = []
+
+            def other_thread():
+                # Другой поток получает свою обёртку Django.
+                other = handler['pool-test']
+                other.ensure_connection()
+                reused.append(other.connection is raw)
+                other.close()
+
+            thread = threading.Thread(target=other_thread)
+            thread.start()
+            thread.join()
+            assert reused == [True], (
+                'Проверьте, что соединение из пула получает запрос '
+                'другого потока'
+            )
+        finally:
+            wrapper.close()
+            close_pools()
@@ -0,0 +1,25 @@
+import pytest
+from rest_framework.test import APIClient
+
+
+@pytest.mark.django_db
+class TestEdgeCacheHeaders:
+
+    def test_anonymous_list_is_public(self, category):
+        response = APIClient().get('/api/v1/categories/')
+        cache_control = response['Cache-Control']
+        for directive in ('public', 's-maxage=5',
+                          'stale-while-revalidate=30'):
+            assert directive in cache_control, (
+                'Проверьте, что анонимный ответ можно кэшировать в nginx'
+            )
+        assert 'Authorization' in response['Vary']
+
+    def test_authenticated_response_is_private(self, category, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/v1/categories/')
+        assert 'private' in response['Cache-Control'], (
+            'Проверьте, что ответы пользователю не кэшируются в nginx'
+        )
+
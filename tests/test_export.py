@@ -0,0 +1,52 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from reviews.models import Review, Title
+
+
+@pytest.mark.django_db
+class TestExport:
+
+    def test_export_round_trips_through_loadcsv(self, tmp_path, title, user):
+        Title.objects.create(name='Без категории', year=2000, description='')
+        Review.objects.create(title=title, author=user, text='Ок', score=7)
+        for model_name in ('Title', 'Review'):
+            call_command('exportcsv', model_name,
+                         '--file', str(tmp_path / f'{model_name}.csv'))
+        header = (tmp_path / 'Review.csv').read_text().splitlines()[0]
+        assert header == 'id,pub_date,title_id,text,author,score', (
+            'Проверьте, что колонки выгрузки совпадают с форматом loadcsv'
+        )
+        exported = list(Title.objects.order_by('pk').values_list(
+            'id', 'name', 'category_id'))
+        Title.objects.all().delete()
+
+        call_command('loadcsv', str(tmp_path / 'Title.csv'), 'Title')
+        call_command('loadcsv', str(tmp_path / 'Review.csv'), 'Review')
+        assert list(Title.objects.order_by('pk').values_list(
+            'id', 'name', 'category_id')) == exported
+        assert Title.objects.get(pk=title.pk).rating == 7
+
+    def test_endpoint_streams_for_admin_only(self, title, user):
+        url = '/api/v1/export/titles/?output=ndjson'
+        client = APIClient()
+        client.force_authenticate(user)
+        assert client.get(url).status_code == 403
+
+        user.role = user.ROLE_NAME_ADMIN
+        user.save()
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.streaming, (
+            'Проверьте, что выгрузка отдаётся потоком'
+        )
+        rows = [json.loads(line)
+                for line in b''.join(response.streaming_content).splitlines()]
+        assert rows == [{
+            'id': title.id, 'name': title.name, 'year': 1994,
+            'description': title.description, 'category': title.category_id,
+        }]
+        assert client.get('/api/v1/export/users/').status_code == 404
@@ -0,0 +1,85 @@
+import importlib.util
+import os
+import runpy
+import shutil
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+
+CONFIG_PATH = os.path.join(settings.BASE_DIR, 'gunicorn.conf.py')
+
+
+class TestGunicornConfig:
+
+    def test_modes(self, monkeypatch):
+        monkeypatch.delenv('GUNICORN_WORKERS', raising=False)
+        monkeypatch.setenv('GUNICORN_WORKER_CLASS', 'gthread')
+        config = runpy.run_path(CONFIG_PATH)
+        assert config['threads'] > 1, (
+            'Проверьте, что в режиме gthread воркер обслуживает '
+            'несколько запросов одновременно'
+        )
+        assert config['preload_app']
+        assert config['max_requests_jitter'] > 0
+        monkeypatch.setenv('GUNICORN_WORKER_CLASS', 'sync')
+        sync = runpy.run_path(CONFIG_PATH)
+        assert sync['workers'] == min(2 * config['cores'] + 1, 12)
+        monkeypatch.setenv('GUNICORN_WORKERS', '3')
+        assert runpy.run_path(CONFIG_PATH)['workers'] == 3
+
+    def test_gevent_fits_database(self, monkeypatch):
+        monkeypatch.setenv('GUNICORN_WORKER_CLASS', 'gevent')
+        monkeypatch.setenv('GUNICORN_WORKERS', '4')
+        monkeypatch.setenv('DB_MAX_CONNECTIONS', '90')
+        monkeypatch.delenv('GUNICORN_WORKER_CONNECTIONS', raising=False)
+        monkeypatch.setenv('DB_ENGINE', 'django.db.backends.postgresql')
+        config = runpy.run_path(CONFIG_PATH)
+        assert config['worker_connections'] == 22, (
+            'Проверьте, что без пула соединения gevent всех воркеров '
+            'не превышают DB_MAX_CONNECTIONS'
+        )
+        assert config['db_connections']() <= 90
+        monkeypatch.setenv('DB_ENGINE', 'api.backends.postgresql_pool')
+        monkeypatch.setenv('DB_POOL_MAX_SIZE', '5')
+        config = runpy.run_path(CONFIG_PATH)
+        assert config['worker_connections'] == 100
+        assert config['db_connections']() == 20
+
+
+@pytest.mark.django_db(transaction=True)
+class TestLoadtest:
+
+    def test_against_running_server(self, live_server):
+        stdout = StringIO()
+        call_command('loadtest', '--target', live_server.url,
+                     '--path', '/api/v1/categories/', '--concurrency', '2',
+                     '--duration', '0.3', stdout=stdout)
+        assert ' 0 ошибок' in stdout.getvalue(), (
+            'Проверьте, что нагрузочный тест получает ответы сервера'
+        )
+        stdout = StringIO()
+        call_command('loadtest', '--target', live_server.url,
+                     '--path', '/api/v1/missing/', '--concurrency', '1',
+                     '--duration', '0.2', stdout=stdout)
+        assert ' 0 запросов' in stdout.getvalue(), (
+            'Проверьте, что ответы 4xx считаются ошибками'
+        )
+
+    @pytest.mark.skipif(shutil.which('gunicorn') is None,
+                        reason='gunicorn не установлен')
+    @pytest.mark.parametrize('mode', ['sync', 'gevent'])
+    def test_spawns_gunicorn(self, monkeypatch, mode):
+        if mode == 'gevent' and importlib.util.find_spec('gevent') is None:
+            pytest.skip('gevent не установлен')
+        monkeypatch.setenv('GUNICORN_WORKERS', '1')
+        stdout = StringIO()
+        # Страница документации не обращается к БД тестов.
+        call_command('loadtest', '--modes', mode, '--path', '/redoc/',
+                     '--concurrency', '2', '--duration', '0.3',
+                     stdout=stdout)
+        output = stdout.getvalue()
+        assert output.startswith(f'{mode}: ') and ' 0 ошибок' in output, (
+            f'Проверьте, что loadtest запускает gunicorn в режиме {mode}'
+        )
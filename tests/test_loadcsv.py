@@ -0,0 +1,137 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import AutoField
+
+from reviews.csv_tools import copy_lines, find_csv_files, load_levels
+from reviews.models import (Category, Comment, Genre, GenreTitle, Review,
+                            Title, User)
+from reviews.search import search_titles
+
+
+@pytest.mark.django_db
+class TestLoadCsv:
+
+    def write_csv(self, tmp_path, name, text):
+        path = tmp_path / name
+        path.write_text(text, encoding='utf-8')
+        return str(path)
+
+    def test_bad_rows_go_to_reject_file(self, tmp_path):
+        path = self.write_csv(tmp_path, 'category.csv', (
+            'id,name,slug\n'
+            '1,Фильм,movie\n'
+            '2,Книга,book\n'
+            '3,Дубль,movie\n'
+            '4,Музыка,music\n'
+        ))
+        call_command('loadcsv', path, 'Category', '--batch-size', '2')
+        assert set(Category.objects.values_list('slug', flat=True)) == {
+            'movie', 'book', 'music'}, (
+            'Проверьте, что плохая строка не прерывает загрузку пакета'
+        )
+        rejected = (tmp_path / 'category.csv.rejected.csv').read_text(
+            encoding='utf-8')
+        assert rejected.splitlines()[1].startswith('3,3,Дубль,movie'), (
+            'Проверьте, что отклонённые строки пишутся в файл с номером строки'
+        )
+        assert (tmp_path / 'category.csv.checkpoint').read_text() == '4'
+
+    def test_resume_from_checkpoint(self, tmp_path):
+        path = self.write_csv(tmp_path, 'category.csv', (
+            'id,name,slug\n'
+            '1,Фильм,movie\n'
+            '2,Книга,book\n'
+        ))
+        (tmp_path / 'category.csv.checkpoint').write_text('1')
+        call_command('loadcsv', path, 'Category', '--resume')
+        assert list(Category.objects.values_list('slug', flat=True)) == [
+            'book']
+
+    def test_reviews_load_rebuilds_ratings(self, tmp_path, title, user):
+        path = self.write_csv(tmp_path, 'review.csv', (
+            'id,title_id,text,author,score,pub_date\n'
+            f'1,{title.id},Текст,{user.id},6,2019-09-24T21:08:21.567Z\n'
+        ))
+        call_command('loadcsv', path, 'Review')
+        assert Review.objects.count() == 1
+        title = Title.objects.get(pk=title.pk)
+        assert (title.score_sum, title.review_count) == (6, 1), (
+            'Проверьте, что после загрузки отзывов пересчитывается рейтинг'
+        )
+
+
+@pytest.mark.django_db
+class TestLoadAll:
+
+    def test_load_order_follows_foreign_keys(self, tmp_path):
+        for name in ('category', 'genre', 'titles', 'genre_title', 'users',
+                     'review', 'comments', 'notes'):
+            (tmp_path / f'{name}.csv').write_text('id\n')
+        models = [Category, Genre, Title, GenreTitle, User, Review, Comment]
+        files = find_csv_files(str(tmp_path), models)
+        assert set(files) == set(models), (
+            'Проверьте сопоставление имён csv-файлов моделям'
+        )
+        assert load_levels(files) == [
+            [Category, Genre, User], [Title], [GenreTitle, Review],
+            [Comment]]
+
+    def test_loads_directory(self, tmp_path, user):
+        files = {
+            'category.csv': 'id,name,slug\n1,Фильм,movie\n',
+            'genre.csv': 'id,name,slug\n1,Драма,drama\n',
+            'titles.csv': 'id,name,year,category\n1,Фильм,2000,1\n',
+            'genre_title.csv': 'id,title_id,genre_id\n1,1,1\n',
+            'review.csv': (
+                'id,title_id,text,author,score,pub_date\n'
+                f'1,1,Текст,{user.id},8,2019-09-24T21:08:21.567Z\n'),
+        }
+        for name, text in files.items():
+            (tmp_path / name).write_text(text, encoding='utf-8')
+        call_command('loadall', str(tmp_path), '--workers', '1')
+        title = Title.objects.get(pk=1)
+        assert list(title.genre.values_list('slug', flat=True)) == ['drama']
+        assert title.rating == 8, (
+            'Проверьте, что после загрузки пересчитываются рейтинги'
+        )
+        assert Title.objects.create(
+            name='Новое', year=2001, category_id=1).pk == 2, (
+            'Проверьте, что последовательности id сдвигаются после загрузки'
+        )
+        assert list(search_titles(Title.objects.all(), 'фильм')) == [
+            title], 'Проверьте, что поисковый индекс создаётся заново'
+
+
+class TestCopyLines:
+
+    @pytest.mark.parametrize('model, row', [
+        (Title, {'id': '1', 'name': 'Побег из Шоушенка', 'year': '1994',
+                 'category': '1'}),
+        (User, {'id': '100', 'username': 'bingobongo',
+                'email': 'bingobongo@yamdb.fake', 'role': 'user',
+                'bio': '', 'first_name': '', 'last_name': ''}),
+    ])
+    def test_fills_not_null_columns(self, model, row):
+        columns, lines = copy_lines(model, [row], connection)
+        values = dict(zip(columns, lines[0].rstrip('\n').split('\t')))
+        required = {field.column for field in model._meta.concrete_fields
+                    if not field.null and not isinstance(field, AutoField)}
+        assert required <= set(columns), (
+            'Проверьте, что COPY заполняет NOT NULL колонки, '
+            'которых нет в csv'
+        )
+        assert all(values[column] != '\\N' for column in required), (
+            'Проверьте, что NOT NULL колонки получают значение по умолчанию'
+        )
+        assert values['id'] == row['id']
+
+    def test_escapes_text(self):
+        columns, lines = copy_lines(Title, [{
+            'name': 'Имя\tс\\табом', 'year': '2000', 'category': '',
+            'description': ''}], connection)
+        values = dict(zip(columns, lines[0].rstrip('\n').split('\t')))
+        assert 'id' not in values
+        assert values['name'] == 'Имя\\tс\\\\табом'
+        assert values['category_id'] == '\\N'
+        assert (values['score_sum'], values['review_count']) == ('0', '0')
@@ -0,0 +1,105 @@
+import pytest
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.serializers import ReviewSerializer, violates_rating_once
+from reviews.models import Category, Review
+
+
+def selects(queries):
+    return [query['sql'] for query in queries
+            if query['sql'].startswith('SELECT')]
+
+
+@pytest.mark.django_db
+class TestNestedQueries:
+
+    def test_review_post_reads_title_once(self, title, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(url, {'text': 'Ок', 'score': 7})
+        assert response.status_code == 201
+        assert len(selects(queries)) == 1, (
+            'Проверьте, что произведение читается один раз, а уникальность '
+            'отзыва проверяет ограничение БД'
+        )
+
+        response = client.post(url, {'text': 'Ещё', 'score': 3})
+        assert response.status_code == 400
+        assert response.json() == {'non_field_errors': [
+            'Пользователь может оставить только один отзыв на произведение.'
+        ]}
+        assert Review.objects.count() == 1
+
+    def test_only_rating_once_is_mapped(self, title, user, another_user):
+        review = Review.objects.create(
+            title=title, author=user, text='Ок', score=7)
+        with pytest.raises(IntegrityError) as duplicate:
+            with transaction.atomic():
+                Review.objects.create(
+                    title=title, author=user, text='Ещё', score=3)
+        assert violates_rating_once(duplicate.value)
+        Category.objects.create(name='Редкое', slug='rare')
+        with pytest.raises(IntegrityError) as other:
+            with transaction.atomic():
+                Category.objects.create(name='Дубль', slug='rare')
+        assert not violates_rating_once(other.value), (
+            'Проверьте, что другие ошибки целостности не выдаются '
+            'за повторный отзыв'
+        )
+
+        Review.objects.create(
+            title=title, author=another_user, text='Ок', score=5)
+        serializer = ReviewSerializer(
+            review, data={'text': 'Ок', 'score': 7}, partial=True)
+        assert serializer.is_valid()
+        with pytest.raises(IntegrityError):
+            serializer.save(author=another_user)
+
+    def test_comment_post_reads_review_once(self, title, user):
+        review = Review.objects.create(
+            title=title, author=user, text='Ок', score=7)
+        client = APIClient()
+        client.force_authenticate(user)
+        url = f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/'
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(url, {'text': 'Согласен'})
+        assert response.status_code == 201
+        assert len(selects(queries)) == 1
+
+    def test_missing_parent_is_404(self, title, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        assert client.get('/api/v1/titles/0/reviews/').status_code == 404
+        assert client.post('/api/v1/titles/0/reviews/', {
+            'text': 'Ок', 'score': 7}).status_code == 404
+        assert client.get(
+            f'/api/v1/titles/{title.id}/reviews/0/comments/'
+        ).status_code == 404
+
+    def list_queries(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(url).status_code == 200
+        return len(queries)
+
+    def test_author_is_joined_on_lists(self, django_user_model, title, user):
+        client = APIClient()
+        reviews_url = f'/api/v1/titles/{title.id}/reviews/'
+        review = Review.objects.create(
+            title=title, author=user, text='Ок', score=7)
+        comments_url = f'{reviews_url}{review.id}/comments/'
+        review.comments.create(author=user, text='Первый')
+        baseline = (self.list_queries(client, reviews_url),
+                    self.list_queries(client, comments_url))
+        for number in range(3):
+            author = django_user_model.objects.create_user(
+                username=f'author{number}', email=f'a{number}@yamdb.fake')
+            Review.objects.create(title=title, author=author, text='Ок')
+            review.comments.create(author=author, text='Ещё')
+        assert (self.list_queries(client, reviews_url),
+                self.list_queries(client, comments_url)) == baseline, (
+            'Проверьте, что авторы выбираются одним запросом со списком'
+        )
@@ -0,0 +1,41 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from reviews.models import Title
+
+
+@pytest.mark.django_db
+class TestCursorPagination:
+
+    def test_titles_cursor_mode(self, category):
+        ids = [
+            Title.objects.create(name=f'Произведение {i}', year=2000,
+                                 description='', category=category).pk
+            for i in range(25)
+        ]
+        client = APIClient()
+        url = '/api/v1/titles/?cursor=&limit=10'
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            assert response.status_code == 200
+            assert not any('COUNT(' in query['sql'].upper()
+                           for query in queries), (
+                'Проверьте, что курсорная пагинация не выполняет COUNT(*)'
+            )
+            data = response.json()
+            assert 'count' not in data
+            seen.extend(title['id'] for title in data['results'])
+            url = data['next']
+        assert seen == sorted(ids, reverse=True), (
+            'Проверьте, что курсорная пагинация отдаёт все записи '
+            'в порядке -id'
+        )
+
+    def test_limit_offset_still_works(self, title):
+        response = APIClient().get('/api/v1/titles/?limit=1&offset=0')
+        assert response.status_code == 200
+        assert response.json()['count'] == 1
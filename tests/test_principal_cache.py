@@ -0,0 +1,63 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.authentication import tokens_for_user
+
+
+def user_queries(queries):
+    return [query['sql'] for query in queries
+            if 'FROM "reviews_user"' in query['sql']]
+
+
+@pytest.mark.django_db
+class TestPrincipalCache:
+
+    def get_client(self, user):
+        _, access = tokens_for_user(user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client
+
+    def test_cache_mode_reads_user_once(self, settings, user):
+        settings.API_PRINCIPAL = {'MODE': 'cache'}
+        client = self.get_client(user)
+        assert client.get('/api/v1/categories/').status_code == 200
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get('/api/v1/categories/').status_code == 200
+        assert not user_queries(queries), (
+            'Проверьте, что пользователь берётся из кэша, а не из БД'
+        )
+
+    def test_claims_mode_does_not_read_user(self, settings, user):
+        settings.API_PRINCIPAL = {'MODE': 'claims'}
+        client = self.get_client(user)
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get('/api/v1/categories/').status_code == 200
+        assert not user_queries(queries), (
+            'Проверьте, что роль берётся из claims токена'
+        )
+
+    @pytest.mark.parametrize('mode', ['cache', 'claims'])
+    def test_role_change_applies_immediately(self, settings, user, mode):
+        settings.API_PRINCIPAL = {'MODE': mode}
+        client = self.get_client(user)
+        assert client.get('/api/v1/users/').status_code == 403
+        user.role = user.ROLE_NAME_ADMIN
+        user.save()
+        assert client.get('/api/v1/users/').status_code == 200, (
+            'Проверьте, что смена роли сбрасывает кэш пользователя'
+        )
+
+    def test_process_local_versions_read_database(self, settings, user):
+        settings.CACHES = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}
+        settings.API_PRINCIPAL = {'MODE': 'claims'}
+        client = self.get_client(user)
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get('/api/v1/categories/').status_code == 200
+        assert user_queries(queries), (
+            'Проверьте, что без общего кэша версий роль читается из БД'
+        )
@@ -0,0 +1,69 @@
+import pstats
+
+import pytest
+from rest_framework.test import APIClient
+
+
+@pytest.fixture
+def profiling(settings, tmp_path):
+    settings.API_PROFILING = dict(
+        settings.API_PROFILING, DIRECTORY=str(tmp_path), MAX_FILES=2,
+        SAMPLE_RATE=0)
+    return settings.API_PROFILING
+
+
+@pytest.mark.django_db
+class TestProfiling:
+
+    def test_sampled_requests_go_to_ring_buffer(self, profiling, tmp_path):
+        profiling['SAMPLE_RATE'] = 1
+        client = APIClient()
+        names = [client.get('/api/v1/titles/')['X-Profile-Id']
+                 for _ in range(3)]
+        assert 'TitleViewSet.list' in names[0]
+        files = sorted(path.name for path in tmp_path.iterdir())
+        assert len(files) == 2, (
+            'Проверьте, что каталог профилей ограничен MAX_FILES'
+        )
+        assert names[-1] in files
+        pstats.Stats(str(tmp_path / names[-1]))
+
+    def test_signed_header_profiles_one_request(self, profiling, user):
+        user.role = user.ROLE_NAME_ADMIN
+        user.save()
+        admin = APIClient()
+        admin.force_authenticate(user)
+        header = admin.post('/api/v1/profiles/').json()
+        client = APIClient()
+        assert 'X-Profile-Id' not in client.get(
+            '/api/v1/titles/', HTTP_X_PROFILE='подделка')
+        name = client.get('/api/v1/titles/',
+                          HTTP_X_PROFILE=header['value'])['X-Profile-Id']
+        assert 'X-Profile-Id' not in client.get(
+            '/api/v1/titles/', HTTP_X_PROFILE=header['value']), (
+            'Проверьте, что заголовок профилирования нельзя использовать '
+            'повторно'
+        )
+
+        listing = admin.get('/api/v1/profiles/').json()
+        assert [profile['name'] for profile in listing] == [name]
+        response = admin.get(f'/api/v1/profiles/{name}/')
+        assert response.status_code == 200
+        assert b''.join(response.streaming_content)
+        assert admin.get('/api/v1/profiles/..%2Fdb.prof/').status_code == 404
+        assert client.get('/api/v1/profiles/').status_code == 401
+
+    def test_header_requires_current_admin(self, profiling, user):
+        user.role = user.ROLE_NAME_ADMIN
+        user.save()
+        admin = APIClient()
+        admin.force_authenticate(user)
+        header = admin.post('/api/v1/profiles/').json()
+        assert header['max_age'] == 60
+        user.role = user.ROLE_NAME_USER
+        user.save()
+        assert 'X-Profile-Id' not in APIClient().get(
+            '/api/v1/titles/', HTTP_X_PROFILE=header['value']), (
+            'Проверьте, что заголовок не действует, если его владелец '
+            'больше не администратор'
+        )
@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.replicas import check_pin_cache
+
+
+@pytest.fixture
+def replica(settings):
+    """Вторая БД: отдельное соединение с той же тестовой базой."""
+    connections.databases['replica1'] = dict(
+        connections.databases['default'])
+    settings.API_REPLICAS = dict(settings.API_REPLICAS, ALIASES=('replica1', ))
+    yield connections['replica1']
+    connections['replica1'].close()
+    del connections['replica1']
+    del connections.databases['replica1']
+
+
+def tables(queries):
+    return ' '.join(query['sql'] for query in queries)
+
+
+def pinned_in_other_process(settings, user):
+    """Видит ли отметку о записи другой процесс (воркер gunicorn)."""
+    code = (
+        'import django; django.setup()\n'
+        'from types import SimpleNamespace\n'
+        'from api.replicas import is_pinned\n'
+        f'print(is_pinned(SimpleNamespace(pk={user.pk}, '
+        'is_authenticated=True)))'
+    )
+    cache = settings.CACHES['default']
+    environment = dict(
+        os.environ, DJANGO_SETTINGS_MODULE='api_yamdb.settings',
+        CACHE_BACKEND=cache['BACKEND'], CACHE_LOCATION=cache['LOCATION'])
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=settings.BASE_DIR,
+        env=environment, stdout=subprocess.PIPE, check=True)
+    return result.stdout.decode().strip() == 'True'
+
+
+@pytest.mark.django_db(transaction=True)
+class TestReplicaRouting:
+
+    def test_reads_go_to_replica(self, replica, category, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(replica) as queries:
+            response = client.get('/api/v1/categories/')
+        assert response.status_code == 200
+        assert 'reviews_category' in tables(queries), (
+            'Проверьте, что GET-запросы к API читают с реплики'
+        )
+
+    def test_cached_response_built_from_primary(self, replica, category):
+        with CaptureQueriesContext(replica) as queries:
+            response = APIClient().get('/api/v1/categories/')
+        assert response.status_code == 200
+        assert 'reviews_category' not in tables(queries), (
+            'Проверьте, что ответ для кэша читается из основной БД, '
+            'а не с отстающей реплики'
+        )
+        assert response.json()['results'][0]['slug'] == category.slug
+
+    def test_author_pinned_to_primary_after_write(self, replica, title,
+                                                  user):
+        client = APIClient()
+        client.force_authenticate(user)
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        with CaptureQueriesContext(replica) as queries:
+            response = client.post(url, {'text': 'Ок', 'score': 7})
+            assert response.status_code == 201
+            response = client.get(url)
+        assert response.json()['results'][0]['text'] == 'Ок'
+        assert not queries.captured_queries, (
+            'Проверьте, что автор изменения читает из основной БД'
+        )
+        with CaptureQueriesContext(replica) as queries:
+            APIClient().get(url)
+        assert 'reviews_review' in tables(queries)
+
+    def test_pin_visible_to_other_workers(self, settings, replica, title,
+                                          user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(f'/api/v1/titles/{title.id}/reviews/',
+                               {'text': 'Ок', 'score': 7})
+        assert response.status_code == 201
+        assert pinned_in_other_process(settings, user), (
+            'Проверьте, что отметка о записи видна другим воркерам'
+        )
+
+    def test_process_local_pin_cache_rejected(self, settings, replica):
+        settings.CACHES = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}
+        with pytest.raises(ImproperlyConfigured):
+            check_pin_cache()
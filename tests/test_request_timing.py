@@ -0,0 +1,41 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api.middleware import request_duration
+
+
+@pytest.mark.django_db
+class TestRequestTiming:
+
+    def test_server_timing_header(self, title, user, settings):
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        client = APIClient()
+        assert not client.get(url).has_header('Server-Timing'), (
+            'Проверьте, что Server-Timing выключен по умолчанию'
+        )
+        settings.API_SERVER_TIMING = True
+        assert not client.get(url).has_header('Server-Timing'), (
+            'Проверьте, что Server-Timing не отдаётся анонимам'
+        )
+        client.force_authenticate(user)
+        assert not client.get(url).has_header('Server-Timing')
+        user.role = user.ROLE_NAME_ADMIN
+        response = client.get(url)
+        assert response.status_code == 200
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'serialize;dur=', 'app;dur=', 'total;dur='):
+            assert metric in timing, (
+                'Проверьте, что Server-Timing содержит замеры запроса'
+            )
+        assert 'desc="2 queries"' in timing
+
+    def test_histograms_on_metrics(self, title):
+        client = APIClient()
+        before = request_duration.count('TitleViewSet.list', 'GET', '2xx')
+        client.get('/api/v1/titles/')
+        assert request_duration.count(
+            'TitleViewSet.list', 'GET', '2xx') == before + 1
+        body = client.get('/metrics').content.decode()
+        assert ('api_request_duration_seconds_bucket{view="TitleViewSet.list"'
+                ',method="GET",status="2xx",le="+Inf"}') in body
+        assert 'api_request_db_queries_total{view="TitleViewSet.list"}' in body
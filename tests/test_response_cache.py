@@ -0,0 +1,71 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.cache import DummyResponseCache, cache_requests, get_response_cache
+from reviews.models import Review, Title
+
+
+@pytest.mark.django_db
+class TestResponseCache:
+
+    def test_anonymous_title_detail_is_cached(self, title):
+        client = APIClient()
+        url = f'/api/v1/titles/{title.id}/'
+        client.get(url)
+        hits = cache_requests.value('TitleViewSet.retrieve', 'hit')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert response.status_code == 200
+        # Остаётся только запрос отметки изменения для ETag.
+        assert len(queries) == 1, (
+            'Проверьте, что повторный анонимный запрос отдаётся из кэша'
+        )
+        assert cache_requests.value('TitleViewSet.retrieve', 'hit') == (
+            hits + 1)
+
+    def test_review_write_invalidates_rating(self, title, user):
+        client = APIClient()
+        url = f'/api/v1/titles/{title.id}/'
+        assert client.get(url).json()['rating'] is None
+        Review.objects.create(title=title, author=user, text='Ок', score=9)
+        assert client.get(url).json()['rating'] == 9, (
+            'Проверьте, что запись отзыва сбрасывает кэш произведений'
+        )
+
+    def test_other_title_review_keeps_detail_cached(self, title, user):
+        other = Title.objects.create(name='Другое', year=2000)
+        client = APIClient()
+        url = f'/api/v1/titles/{title.id}/'
+        client.get(url)
+        Review.objects.create(title=other, author=user, text='Ок', score=3)
+        hits = cache_requests.value('TitleViewSet.retrieve', 'hit')
+        client.get(url)
+        assert cache_requests.value('TitleViewSet.retrieve', 'hit') == (
+            hits + 1), (
+            'Проверьте, что отзыв к другому произведению не сбрасывает '
+            'кэш этого произведения'
+        )
+
+    def test_authenticated_requests_bypass_cache(self, title, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        url = f'/api/v1/titles/{title.id}/'
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        assert len(queries) > 0
+
+    def test_metrics_endpoint(self, client):
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert b'api_response_cache_requests_total' in response.content
+
+    def test_disabled_with_process_local_versions(self, settings):
+        settings.CACHES = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}
+        assert isinstance(get_response_cache(), DummyResponseCache), (
+            'Проверьте, что без общего кэша версий кэш ответов выключен'
+        )
@@ -0,0 +1,57 @@
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.mail import get_mail_queue, queue_mail
+from reviews.models import User
+
+
+class FlakyBackend(EmailBackend):
+    """Первая попытка отправки каждого письма падает."""
+    failed = set()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.subject not in self.failed:
+                self.failed.add(message.subject)
+                raise ConnectionError('SMTP недоступен')
+        return super().send_messages(messages)
+
+
+@pytest.mark.django_db
+class TestSignupMail:
+
+    def test_signup_is_single_write(self, settings):
+        settings.API_MAIL_QUEUE = {'BACKEND': 'api.mail.ImmediateMailQueue'}
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().post('/api/v1/auth/signup/', {
+                'username': 'newbie', 'email': 'newbie@yamdb.fake'})
+        assert response.status_code == 200
+        writes = [query['sql'] for query in queries
+                  if not query['sql'].startswith('SELECT')]
+        assert len(writes) == 1, (
+            'Проверьте, что пользователь с кодом сохраняется одним запросом'
+        )
+        user = User.objects.get(username='newbie')
+        assert len(mail.outbox) == 1
+        assert user.confirmation_code in mail.outbox[0].body
+
+    def test_threaded_queue_retries(self, settings):
+        settings.EMAIL_BACKEND = 'tests.test_signup_mail.FlakyBackend'
+        settings.API_MAIL_QUEUE = {
+            'BACKEND': 'api.mail.ThreadedMailQueue',
+            'OPTIONS': {'WORKERS': 2, 'RETRY_BACKOFF': 0.01},
+        }
+        FlakyBackend.failed.clear()
+        for number in range(3):
+            queue_mail(f'Письмо {number}', 'Текст', ['to@yamdb.fake'])
+        assert get_mail_queue().flush(timeout=5), (
+            'Проверьте, что очередь отправляет письма в фоне'
+        )
+        assert sorted(message.subject for message in mail.outbox) == [
+            'Письмо 0', 'Письмо 1', 'Письмо 2'], (
+            'Проверьте, что неотправленные письма повторяются'
+        )
@@ -0,0 +1,71 @@
+import pytest
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from api.models import SlowQuery
+from api.slow_queries import get_slow_query_writer, normalize_sql
+from reviews.models import Genre
+
+LOG_ALL_QUERIES = override_settings(API_SLOW_QUERIES={
+    'ENABLED': True, 'THRESHOLD_MS': 0, 'EXPLAIN': True, 'STORE': True})
+
+
+@pytest.fixture
+def slow_query_writer(transactional_db):
+    yield
+    # Запросы, записанные к концу теста, сохраняются до очистки БД.
+    get_slow_query_writer().flush(timeout=10)
+
+
+def stored_queries():
+    assert get_slow_query_writer().flush(timeout=10)
+    return SlowQuery.objects.all()
+
+
+class TestNormalizeSql:
+
+    def test_parameters_share_fingerprint(self):
+        assert normalize_sql(
+            'SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 20'
+        ) == normalize_sql(
+            'SELECT  *  FROM t WHERE id IN (%s) LIMIT 5'
+        ), 'Проверьте, что значения и списки IN не влияют на отпечаток'
+        assert normalize_sql("SELECT 'a''b', t1.x FROM t1") == (
+            'SELECT %s, t1.x FROM t1')
+
+
+@pytest.mark.usefixtures('slow_query_writer')
+class TestSlowQueryLog:
+
+    @LOG_ALL_QUERIES
+    def test_slow_queries_grouped_with_plan(self, title):
+        client = APIClient()
+        client.get('/api/v1/titles/?genre=drama')
+        client.get('/api/v1/titles/?genre=DRAMA')
+        entries = stored_queries().filter(
+            view='TitleViewSet.list', sql__startswith='SELECT "reviews_title"',
+            sql__contains='LIKE')
+        assert entries.count() == 1, (
+            'Проверьте, что запросы с разными параметрами '
+            'дают один отпечаток'
+        )
+        entry = entries.get()
+        assert entry.count == 2
+        assert entry.max_duration <= entry.total_duration
+        assert entry.plan, 'Проверьте, что для отпечатка сохранён EXPLAIN'
+
+    @LOG_ALL_QUERIES
+    def test_entry_survives_rollback(self):
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                Genre.objects.filter(slug='rollback').exists()
+                raise RuntimeError
+        assert stored_queries().filter(
+            sql__contains='"reviews_genre"."slug"').exists(), (
+            'Проверьте, что журнал пишется вне транзакции запроса'
+        )
+
+    def test_fast_queries_not_logged(self, title):
+        APIClient().get('/api/v1/titles/')
+        assert not stored_queries().exists()
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.renderers import FastJSONRenderer
+from reviews.models import Review
+
+
+@pytest.mark.django_db
+class TestSparseFields:
+
+    def test_title_fields(self, title):
+        response = APIClient().get('/api/v1/titles/?fields=id,name,bogus')
+        assert response.status_code == 200
+        assert response.json()['results'] == [
+            {'id': title.id, 'name': title.name}
+        ], 'Проверьте, что ?fields= оставляет в ответе только эти поля'
+
+    def test_review_fields_and_writes(self, title, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        url = f'/api/v1/titles/{title.id}/reviews/?fields=score'
+        response = client.post(url, {'text': 'Ок', 'score': 7})
+        assert response.status_code == 201
+        assert 'text' in response.json(), (
+            'Проверьте, что ?fields= не влияет на изменяющие запросы'
+        )
+        review = Review.objects.get()
+        response = client.get(
+            f'/api/v1/titles/{title.id}/reviews/{review.id}/?fields=score')
+        assert response.json() == {'score': 7}
+
+    def test_user_me_fields(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/v1/users/me/?fields=username')
+        assert response.json() == {'username': user.username}
+
+
+class TestFastJSONRenderer:
+
+    def test_matches_drf_output(self):
+        data = {'name': 'Фильм  ', 'rating': None, 'genre': [1, 2],
+                5: 'число'}
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+        assert json.loads(FastJSONRenderer().render(data)) == {
+            'name': 'Фильм  ', 'rating': None, 'genre': [1, 2],
+            '5': 'число'}
+
+    @pytest.mark.parametrize('option', [
+        {'compact': False}, {'ensure_ascii': True},
+    ])
+    def test_json_settings_respected(self, option):
+        data = {'name': 'Фильм', 'genre': [1, 2]}
+        fast = type('Renderer', (FastJSONRenderer, ), option)
+        drf = type('Renderer', (JSONRenderer, ), option)
+        assert fast().render(data) == drf().render(data), (
+            'Проверьте, что COMPACT_JSON и UNICODE_JSON не игнорируются'
+        )
+
+    def test_strict_json_respected(self):
+        fast = type('Renderer', (FastJSONRenderer, ), {'strict': False})
+        assert fast().render({'rating': float('nan')}) == (
+            b'{"rating":NaN}')
+
+    def test_msgpack_negotiated(self, db, category):
+        msgpack = pytest.importorskip('msgpack')
+        response = APIClient().get('/api/v1/categories/',
+                                   HTTP_ACCEPT='application/msgpack')
+        assert response['Content-Type'] == 'application/msgpack'
+        assert msgpack.unpackb(response.content)['results'][0]['slug'] == (
+            category.slug)
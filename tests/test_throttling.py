@@ -0,0 +1,108 @@
+import pytest
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.throttling import CacheBucketStorage, SharedMemoryBucketStorage
+
+
+@pytest.fixture
+def throttle_rates(settings):
+    cache.clear()
+    settings.API_THROTTLE = {
+        'STORAGE': 'api.throttling.CacheBucketStorage',
+        'RATES': {'signup': '2/min', 'token': '3/min',
+                  'token_address': '5/min', 'writes': '1/min'},
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('throttle_rates')
+class TestThrottling:
+
+    def test_token_attempts_are_limited_before_db(self, user):
+        client = APIClient()
+        data = {'username': user.username, 'confirmation_code': 'wrong'}
+        for _ in range(3):
+            assert client.post('/api/v1/auth/token/', data).status_code == 400
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post('/api/v1/auth/token/', data)
+        assert response.status_code == 429, (
+            'Проверьте, что перебор кода подтверждения ограничен'
+        )
+        assert int(response['Retry-After']) > 0
+        assert not queries, (
+            'Проверьте, что лишний запрос отклоняется до обращения к БД'
+        )
+
+    def test_token_limit_is_per_address(self, user):
+        data = {'username': user.username, 'confirmation_code': 'wrong'}
+        attacker = APIClient(REMOTE_ADDR='10.0.0.1')
+        for _ in range(4):
+            attacker.post('/api/v1/auth/token/', data)
+        victim = APIClient(REMOTE_ADDR='10.0.0.2')
+        assert victim.post('/api/v1/auth/token/', data).status_code == 400, (
+            'Проверьте, что чужие попытки не блокируют получение токена'
+        )
+
+    def test_token_attempts_for_many_names_are_limited(self):
+        client = APIClient()
+        statuses = [
+            client.post('/api/v1/auth/token/', {
+                'username': f'user{number}', 'confirmation_code': 'wrong',
+            }).status_code
+            for number in range(6)
+        ]
+        assert statuses[-1] == 429, (
+            'Проверьте, что перебор имён с одного адреса ограничен'
+        )
+
+    def test_forwarded_for_cannot_be_spoofed(self):
+        statuses = [
+            APIClient().post(
+                '/api/v1/auth/signup/',
+                {'username': f'user{number}',
+                 'email': f'user{number}@yamdb.fake'},
+                HTTP_X_FORWARDED_FOR=f'192.0.2.{number}, 10.0.0.1',
+            ).status_code
+            for number in range(3)
+        ]
+        assert statuses[-1] == 429, (
+            'Проверьте, что адрес клиента берёт последний прокси (nginx), '
+            'а не присланный клиентом X-Forwarded-For'
+        )
+
+    def test_review_writes_are_limited(self, title, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        assert client.post(url, {'text': 'Ок', 'score': 7}).status_code == 201
+        assert client.post(url, {'text': 'Ок', 'score': 7}).status_code == 429
+        assert client.get(url).status_code == 200, (
+            'Проверьте, что чтение не расходует лимит записи'
+        )
+
+
+class TestSharedMemoryStorage:
+
+    def test_workers_share_buckets(self, tmp_path):
+        options = {'PATH': str(tmp_path / 'throttle'), 'SLOTS': 16}
+        first = SharedMemoryBucketStorage(options)
+        second = SharedMemoryBucketStorage(options)
+        assert first.consume('token:a', 2, 1 / 60) == 0
+        assert second.consume('token:a', 2, 1 / 60) == 0
+        assert first.consume('token:a', 2, 1 / 60) > 0, (
+            'Проверьте, что процессы расходуют одно ведро'
+        )
+
+
+class TestCacheBucketStorage:
+
+    def test_process_local_cache_is_rejected(self, settings):
+        settings.CACHES = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}
+        with pytest.raises(ImproperlyConfigured):
+            CacheBucketStorage({'CACHE_ALIAS': 'default'})
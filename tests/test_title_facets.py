@@ -0,0 +1,52 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from reviews.models import Category, Genre, Title
+
+
+@pytest.mark.django_db
+class TestTitleFacets:
+
+    @pytest.fixture
+    def catalogue(self, category, genre):
+        book = Category.objects.create(name='Книга', slug='book')
+        comedy = Genre.objects.create(name='Комедия', slug='comedy')
+        for name, year, cat, genres in (
+            ('Первый', 1994, category, (genre, )),
+            ('Второй', 1994, category, (genre, comedy)),
+            ('Третий', 2001, book, (comedy, )),
+        ):
+            title = Title.objects.create(name=name, year=year,
+                                         description='', category=cat)
+            title.genre.set(genres)
+
+    def test_facet_counts(self, catalogue):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/v1/titles/facets/?genre=drama')
+        assert response.status_code == 200
+        assert len(queries) <= 4, (
+            'Проверьте, что фасеты считаются несколькими групповыми '
+            'запросами'
+        )
+        data = response.json()
+        assert data['count'] == 2
+        assert {g['slug']: g['count'] for g in data['genre']} == {
+            'drama': 2, 'comedy': 2}, (
+            'Проверьте, что фасет жанров не учитывает собственный фильтр'
+        )
+        assert {c['slug']: c['count'] for c in data['category']} == {
+            'movie': 2}
+        assert data['year'] == [{'year': 1994, 'count': 2}]
+
+    def test_facets_cached_until_catalogue_changes(self, catalogue, genre):
+        client = APIClient()
+        url = '/api/v1/titles/facets/'
+        client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        assert len(queries) == 0
+        Title.objects.create(name='Четвёртый', year=2010, description='')
+        assert client.get(url).json()['count'] == 4
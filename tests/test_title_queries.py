@@ -0,0 +1,38 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from reviews.models import Genre, Title
+
+# COUNT для пагинации, страница произведений с категориями, жанры страницы.
+TITLE_LIST_QUERY_BUDGET = 3
+
+
+@pytest.mark.django_db
+class TestTitleListQueries:
+
+    def create_titles(self, category, amount):
+        genres = [
+            Genre.objects.create(name=f'Жанр {i}', slug=f'genre-{i}')
+            for i in range(3)
+        ]
+        for i in range(amount):
+            title = Title.objects.create(
+                name=f'Произведение {i}', year=2000, description='',
+                category=category)
+            title.genre.set(genres)
+
+    @pytest.mark.parametrize('limit', (5, 50))
+    def test_title_list_query_budget(self, category, limit):
+        self.create_titles(category, 50)
+        client = APIClient()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/v1/titles/?limit={limit}')
+        assert response.status_code == 200
+        assert len(response.json()['results']) == limit
+        assert len(queries) <= TITLE_LIST_QUERY_BUDGET, (
+            'Проверьте, что список произведений загружается фиксированным '
+            'числом запросов (select_related/prefetch_related), '
+            f'выполнено запросов: {len(queries)}'
+        )
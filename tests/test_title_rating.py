@@ -0,0 +1,49 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from reviews.models import Review, Title
+
+
+@pytest.mark.django_db
+class TestTitleRating:
+
+    def refresh(self, title):
+        return Title.objects.get(pk=title.pk)
+
+    def test_rating_follows_review_writes(self, title, user, another_user):
+        review = Review.objects.create(
+            title=title, author=user, text='Отлично', score=10)
+        Review.objects.create(
+            title=title, author=another_user, text='Неплохо', score=5)
+        title = self.refresh(title)
+        assert (title.score_sum, title.review_count) == (15, 2), (
+            'Проверьте, что при создании отзыва обновляются агрегаты '
+            'произведения'
+        )
+        assert title.rating == 7.5
+
+        review = Review.objects.get(pk=review.pk)
+        review.score = 4
+        review.save()
+        title = self.refresh(title)
+        assert (title.score_sum, title.review_count) == (9, 2), (
+            'Проверьте, что при изменении оценки агрегаты пересчитываются'
+        )
+
+        review.delete()
+        title = self.refresh(title)
+        assert (title.score_sum, title.review_count) == (5, 1), (
+            'Проверьте, что при удалении отзыва агрегаты уменьшаются'
+        )
+
+    def test_rebuild_ratings_command(self, title, user):
+        Review.objects.create(title=title, author=user, text='Ок', score=8)
+        Title.objects.filter(pk=title.pk).update(score_sum=0, review_count=0)
+
+        with pytest.raises(CommandError):
+            call_command('rebuild_ratings', '--check')
+        call_command('rebuild_ratings')
+        call_command('rebuild_ratings', '--check')
+        title = self.refresh(title)
+        assert (title.score_sum, title.review_count) == (8, 1)
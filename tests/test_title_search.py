@@ -0,0 +1,84 @@
+import importlib
+
+import pytest
+from django.db import connection
+from django.db.backends.postgresql.base import DatabaseWrapper
+from rest_framework.test import APIClient
+
+from reviews.models import Title
+from reviews.search import search_postgresql
+
+migration = importlib.import_module('reviews.migrations.0004_title_search')
+
+
+def postgresql_sql(queryset):
+    """SQL запроса в диалекте PostgreSQL, без подключения к серверу."""
+    settings_dict = dict(connection.settings_dict,
+                         ENGINE='django.db.backends.postgresql')
+    wrapper = DatabaseWrapper(settings_dict, alias='postgresql')
+    sql, params = queryset.query.get_compiler(connection=wrapper).as_sql()
+    return sql, params
+
+
+class TestPostgresqlSearchSQL:
+
+    def test_query_uses_migration_indexes(self):
+        sql, params = postgresql_sql(
+            search_postgresql(Title.objects.all(), ['отец'], 'отец'))
+        unqualified = sql.replace('"reviews_title".', '').replace('"', '')
+        index_sql = migration.PG_CREATE_SQL[1]
+        document = index_sql[index_sql.index('((') + 2:-2]
+        assert document.startswith('to_tsvector(')
+        assert f'{document} @@ to_tsquery(\'simple\', %s)' in unqualified, (
+            'Проверьте, что выражение tsvector в запросе совпадает '
+            'с выражением GIN-индекса, иначе индекс не используется'
+        )
+        assert 'name %% %s' in unqualified, (
+            'Проверьте, что запрос использует триграммный оператор pg_trgm'
+        )
+        assert f'ts_rank({document}' in unqualified
+        assert 'similarity(name, %s)' in unqualified
+        assert params[:2] == ('отец:*', 'отец')
+
+    def test_migration_creates_trigram_index(self):
+        assert migration.PG_CREATE_SQL[0] == (
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        assert migration.PG_CREATE_SQL[2].endswith(
+            'USING gin (name gin_trgm_ops)')
+
+
+@pytest.mark.django_db
+class TestTitleSearch:
+
+    def test_search_ranks_and_filters(self, category):
+        Title.objects.create(name='Крёстный отец', year=1972,
+                             description='Семейная сага', category=category)
+        best = Title.objects.create(
+            name='Отец и сын', year=2003,
+            description='Отец, сын и отцовство', category=category)
+        Title.objects.create(name='Матрица', year=1999,
+                             description='Фантастика', category=category)
+
+        response = APIClient().get('/api/v1/titles/?search=отец')
+        assert response.status_code == 200
+        names = [title['name'] for title in response.json()['results']]
+        assert set(names) == {'Крёстный отец', 'Отец и сын'}, (
+            'Проверьте, что параметр search ищет по названию и описанию'
+        )
+        assert names[0] == best.name, (
+            'Проверьте, что результаты поиска отсортированы по релевантности'
+        )
+
+    def test_search_follows_updates(self, title):
+        client = APIClient()
+        title.name = 'Зелёная миля'
+        title.save()
+        response = client.get('/api/v1/titles/?search=зелён')
+        assert [t['id'] for t in response.json()['results']] == [title.id]
+        title.delete()
+        response = client.get('/api/v1/titles/?search=зелён')
+        assert response.json()['results'] == []
+
+    def test_empty_search(self, title):
+        response = APIClient().get('/api/v1/titles/?search=%20!')
+        assert response.json()['results'] == []